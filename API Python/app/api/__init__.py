@@ -2,7 +2,7 @@
 Agrupa todos os routers da API
 """
 from fastapi import APIRouter
-from app.api import processamento, gastos
+from app.api import processamento, jobs, gastos, resumo, importacao, exportacao, busca
 
 # Router principal que agrupa todos os routers
 api_router = APIRouter()
@@ -13,6 +13,32 @@ api_router.include_router(
     tags=["Processamento"]
 )
 
+api_router.include_router(
+    jobs.router,
+    tags=["Processamento"]
+)
+
+# Antes de gastos: /gastos/resumo não pode cair em /gastos/{gasto_id}
+api_router.include_router(
+    resumo.router,
+    tags=["Resumo"]
+)
+
+api_router.include_router(
+    importacao.router,
+    tags=["Gastos"]
+)
+
+api_router.include_router(
+    exportacao.router,
+    tags=["Gastos"]
+)
+
+api_router.include_router(
+    busca.router,
+    tags=["Gastos"]
+)
+
 api_router.include_router(
     gastos.router,
     tags=["Gastos"]
@@ -0,0 +1,37 @@
+"""
+Rota de busca textual de gastos
+"""
+import time
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.api.serializacao import campos_solicitados, colunas, gasto_para_dict
+from app.core.metrics import metrics
+from app.database.busca import buscar
+from app.database.models import get_db
+from app.models.schemas import GastoResponse
+
+router = APIRouter()
+
+
+@router.get("/gastos/busca", response_model=List[GastoResponse])
+def buscar_gastos(
+    q: str = Query(..., min_length=1, max_length=200, description="Termos buscados em item e descrição"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(40, ge=1, le=200),
+    fields: Optional[str] = Query(None, description="Campos retornados, separados por vírgula"),
+    db: Session = Depends(get_db)
+):
+    """
+    Busca gastos pelo item e pelo texto original, do mais relevante para o menos
+    
+    Usa o índice de texto do banco (FTS5 no SQLite, FULLTEXT no MySQL); cada
+    termo também casa como prefixo e acentos são ignorados no SQLite.
+    """
+    campos = campos_solicitados(fields)
+    inicio = time.perf_counter()
+    linhas = buscar(db, q, colunas(campos), limit=limit, skip=skip)
+    metrics.observar("busca_latencia_ms", (time.perf_counter() - inicio) * 1000)
+    
+    return ORJSONResponse([gasto_para_dict(linha, campos) for linha in linhas])
@@ -0,0 +1,96 @@
+"""
+Rota de exportação de gastos (CSV ou NDJSON) em streaming
+"""
+import csv
+import io
+import json
+from datetime import date, timedelta
+from typing import Iterator, Literal, Optional
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import false, select
+from app.config import settings
+from app.core.metrics import metrics
+from app.database.models import CATEGORIAS, SessionLocal, Gasto
+
+router = APIRouter()
+
+COLUNAS = ["id", "valor", "item", "categoria", "meio_pagamento", "descricao_original", "data_criacao"]
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def _consulta(data_inicio: Optional[date], data_fim: Optional[date], categoria: Optional[str]):
+    query = select(*(getattr(Gasto, coluna) for coluna in COLUNAS))
+    if data_inicio:
+        query = query.where(Gasto.data_criacao >= data_inicio)
+    if data_fim:
+        # data_fim é inclusiva: vai até o fim do dia
+        query = query.where(Gasto.data_criacao < data_fim + timedelta(days=1))
+    if categoria:
+        # Categoria fora do domínio não tem id na tabela de consulta: nenhum resultado
+        query = query.where(Gasto.categoria == categoria if categoria in CATEGORIAS else false())
+    # Mesma ordem do índice (data_criacao, id): sem ordenação em memória no banco
+    return query.order_by(Gasto.data_criacao, Gasto.id)
+
+
+def _gerar(query, formato: str) -> Iterator[str]:
+    """
+    Percorre o resultado com um cursor do lado do servidor e gera o arquivo em pedaços
+
+    A sessão é aberta aqui, e não via Depends(get_db), para viver exatamente
+    enquanto a resposta está sendo enviada.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    if formato == "csv":
+        # O cabeçalho sai antes mesmo da consulta ser executada
+        escritor.writerow(COLUNAS)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    linhas = 0
+    with SessionLocal() as db:
+        resultado = db.execute(
+            query.execution_options(yield_per=settings.EXPORT_CHUNK_SIZE)
+        )
+        for bloco in resultado.partitions():
+            if formato == "csv":
+                escritor.writerows(
+                    (*linha[:-1], linha[-1].isoformat()) for linha in bloco
+                )
+            else:
+                for linha in bloco:
+                    registro = dict(zip(COLUNAS, linha))
+                    registro["data_criacao"] = registro["data_criacao"].isoformat()
+                    buffer.write(json.dumps(registro, ensure_ascii=False))
+                    buffer.write("\n")
+
+            linhas += len(bloco)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    metrics.incrementar("exportacao_linhas", linhas)
+
+
+@router.get("/gastos/export")
+def exportar_gastos(
+    formato: Literal["csv", "ndjson"] = "csv",
+    data_inicio: Optional[date] = Query(None, description="AAAA-MM-DD (inclusivo)"),
+    data_fim: Optional[date] = Query(None, description="AAAA-MM-DD (inclusivo)"),
+    categoria: Optional[str] = None
+):
+    """
+    Exporta os gastos em CSV ou NDJSON, do mais antigo para o mais recente
+
+    O arquivo é enviado à medida que as linhas são lidas do banco (cursor do
+    lado do servidor, `EXPORT_CHUNK_SIZE` linhas por vez), então o uso de
+    memória não depende do tamanho da exportação.
+    """
+    query = _consulta(data_inicio, data_fim, categoria)
+    return StreamingResponse(
+        _gerar(query, formato),
+        media_type=MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="gastos.{formato}"'}
+    )
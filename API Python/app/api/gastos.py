@@ -1,17 +1,76 @@
 """
 Rotas CRUD de gastos financeiros
 """
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import and_, or_, select
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List, Optional, Tuple
+from app.api.serializacao import campos_solicitados, colunas, gasto_para_dict
 from app.database.models import get_db, Gasto
+from app.database.resumo import acumular_gasto, aplicar_deltas, registrar_gastos
+from app.database.versao import incrementar_versao, obter_versao
 from app.models.schemas import GastoCreate, GastoUpdate, GastoResponse
 
 router = APIRouter()
 
 
+def _codificar_cursor(gasto) -> str:
+    """Cursor opaco apontando para a posição (data_criacao, id) do gasto"""
+    posicao = json.dumps([gasto.data_criacao.isoformat(), gasto.id])
+    return base64.urlsafe_b64encode(posicao.encode()).decode().rstrip("=")
+
+
+def _decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Converte o cursor de volta em (data_criacao, id)"""
+    try:
+        preenchido = cursor + "=" * (-len(cursor) % 4)
+        data_criacao, gasto_id = json.loads(base64.urlsafe_b64decode(preenchido))
+        return datetime.fromisoformat(data_criacao), int(gasto_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _validacao_cache(request: Request, db: Session) -> Tuple[Optional[Response], Dict[str, str]]:
+    """
+    Confere If-None-Match / If-Modified-Since contra a versão atual dos gastos
+    
+    Retorna a resposta 304 quando o cliente já tem a versão atual (sem consultar
+    os gastos) e, em todo caso, os cabeçalhos de validação da resposta.
+    """
+    versao, atualizado_em = obter_versao(db)
+    # A mesma versão gera ETags diferentes para URLs (filtros, páginas) diferentes
+    url = f"{request.url.path}?{request.url.query}"
+    etag = f'W/"{versao}-{hashlib.sha1(url.encode()).hexdigest()[:12]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if atualizado_em is not None:
+        atualizado_em = atualizado_em.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(atualizado_em, usegmt=True)
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etags = {valor.strip() for valor in if_none_match.split(",")}
+        if etag in etags or "*" in etags:
+            return Response(status_code=304, headers=headers), headers
+    elif atualizado_em is not None and request.headers.get("if-modified-since"):
+        try:
+            desde = parsedate_to_datetime(request.headers["if-modified-since"])
+        except (TypeError, ValueError):
+            desde = None
+        # Comparação com microssegundos: na dúvida (mesmo segundo) responde 200
+        if desde is not None and desde.tzinfo is not None and atualizado_em <= desde:
+            return Response(status_code=304, headers=headers), headers
+    
+    return None, headers
+
+
 @router.post("/gastos", response_model=GastoResponse)
-async def criar_gasto(
+def criar_gasto(
     gasto: GastoCreate,
     db: Session = Depends(get_db)
 ):
@@ -28,18 +87,14 @@ async def criar_gasto(
         )
         
         db.add(gasto_db)
+        db.flush()
+        registrar_gastos(db, [gasto_db])
+        incrementar_versao(db)
+        # Após o flush o objeto já tem id e data: dispensa o refresh pós-commit
+        resposta = gasto_para_dict(gasto_db)
         db.commit()
-        db.refresh(gasto_db)
         
-        return GastoResponse(
-            id=gasto_db.id,
-            valor=gasto_db.valor,
-            item=gasto_db.item,
-            categoria=gasto_db.categoria,
-            meio_pagamento=gasto_db.meio_pagamento,
-            descricao_original=gasto_db.descricao_original,
-            data_criacao=gasto_db.data_criacao
-        )
+        return ORJSONResponse(resposta)
         
     except Exception as e:
         db.rollback()
@@ -47,54 +102,70 @@ async def criar_gasto(
 
 
 @router.get("/gastos", response_model=List[GastoResponse])
-async def listar_gastos(
+def listar_gastos(
+    request: Request,
     skip: int = 0,
     limit: int = 40,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Campos retornados, separados por vírgula (ex.: valor,categoria,data_criacao)"),
     db: Session = Depends(get_db)
 ):
     """
-    Lista todos os gastos cadastrados
+    Lista todos os gastos cadastrados, do mais recente para o mais antigo
+    
+    Quando há mais resultados, o cabeçalho `X-Next-Cursor` traz o cursor da
+    próxima página; envie-o em `cursor` para continuar (o custo é o mesmo da
+    primeira página). `skip` é mantido por compatibilidade e ignorado quando
+    `cursor` é informado. Com `fields`, só as colunas pedidas são lidas do banco.
+    
+    Responde 304 a `If-None-Match` com o ETag atual sem consultar os gastos.
     """
-    gastos = db.query(Gasto).order_by(Gasto.data_criacao.desc()).offset(skip).limit(limit).all()
-    return [
-        GastoResponse(
-            id=gasto.id,
-            valor=gasto.valor,
-            item=gasto.item,
-            categoria=gasto.categoria,
-            meio_pagamento=gasto.meio_pagamento,
-            descricao_original=gasto.descricao_original,
-            data_criacao=gasto.data_criacao
-        )
-        for gasto in gastos
-    ]
+    nao_modificado, headers = _validacao_cache(request, db)
+    if nao_modificado is not None:
+        return nao_modificado
+    
+    campos = campos_solicitados(fields)
+    # data_criacao e id são necessários para montar o cursor
+    extras = tuple(campo for campo in ("data_criacao", "id") if campo not in campos)
+    query = select(*colunas(campos + extras)).order_by(Gasto.data_criacao.desc(), Gasto.id.desc())
+    if cursor:
+        data_criacao, gasto_id = _decodificar_cursor(cursor)
+        query = query.where(or_(
+            Gasto.data_criacao < data_criacao,
+            and_(Gasto.data_criacao == data_criacao, Gasto.id < gasto_id)
+        ))
+    elif skip:
+        query = query.offset(skip)
+    
+    linhas = db.execute(query.limit(limit)).all()
+    if linhas and len(linhas) == limit:
+        headers["X-Next-Cursor"] = _codificar_cursor(linhas[-1])
+    
+    return ORJSONResponse([gasto_para_dict(linha, campos) for linha in linhas], headers=headers)
 
 
 @router.get("/gastos/{gasto_id}", response_model=GastoResponse)
-async def obter_gasto(
+def obter_gasto(
     gasto_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
     Obtém um gasto específico por ID
     """
+    nao_modificado, headers = _validacao_cache(request, db)
+    if nao_modificado is not None:
+        return nao_modificado
+    
     gasto = db.query(Gasto).filter(Gasto.id == gasto_id).first()
     if not gasto:
         raise HTTPException(status_code=404, detail="Gasto não encontrado")
     
-    return GastoResponse(
-        id=gasto.id,
-        valor=gasto.valor,
-        item=gasto.item,
-        categoria=gasto.categoria,
-        meio_pagamento=gasto.meio_pagamento,
-        descricao_original=gasto.descricao_original,
-        data_criacao=gasto.data_criacao
-    )
+    return ORJSONResponse(gasto_para_dict(gasto), headers=headers)
 
 
 @router.put("/gastos/{gasto_id}", response_model=GastoResponse)
-async def atualizar_gasto(
+def atualizar_gasto(
     gasto_id: int,
     gasto_update: GastoUpdate,
     db: Session = Depends(get_db)
@@ -107,6 +178,10 @@ async def atualizar_gasto(
         raise HTTPException(status_code=404, detail="Gasto não encontrado")
     
     try:
+        # Retira os valores antigos do resumo e soma os novos ao final
+        deltas = {}
+        acumular_gasto(deltas, gasto, sinal=-1)
+        
         # Atualiza apenas os campos fornecidos
         if gasto_update.valor is not None:
             if gasto_update.valor <= 0:
@@ -125,18 +200,13 @@ async def atualizar_gasto(
         if gasto_update.descricao_original is not None:
             gasto.descricao_original = gasto_update.descricao_original
         
+        acumular_gasto(deltas, gasto, sinal=1)
+        aplicar_deltas(db, deltas)
+        incrementar_versao(db)
+        resposta = gasto_para_dict(gasto)
         db.commit()
-        db.refresh(gasto)
         
-        return GastoResponse(
-            id=gasto.id,
-            valor=gasto.valor,
-            item=gasto.item,
-            categoria=gasto.categoria,
-            meio_pagamento=gasto.meio_pagamento,
-            descricao_original=gasto.descricao_original,
-            data_criacao=gasto.data_criacao
-        )
+        return ORJSONResponse(resposta)
         
     except HTTPException:
         raise
@@ -146,7 +216,7 @@ async def atualizar_gasto(
 
 
 @router.delete("/gastos/{gasto_id}")
-async def deletar_gasto(
+def deletar_gasto(
     gasto_id: int,
     db: Session = Depends(get_db)
 ):
@@ -157,6 +227,8 @@ async def deletar_gasto(
     if not gasto:
         raise HTTPException(status_code=404, detail="Gasto não encontrado")
     
+    registrar_gastos(db, [gasto], sinal=-1)
+    incrementar_versao(db)
     db.delete(gasto)
     db.commit()
     
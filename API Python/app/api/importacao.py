@@ -0,0 +1,197 @@
+"""
+Rota de importação em massa de gastos (CSV ou NDJSON)
+"""
+import codecs
+import csv
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.core.metrics import metrics
+from app.database.models import get_db, Gasto
+from app.database.resumo import acumular_delta, aplicar_deltas
+from app.database.versao import incrementar_versao
+from app.models.schemas import ErroImportacao, GastoImportacao, ImportacaoResponse
+
+router = APIRouter()
+
+EXTENSOES = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+CONTENT_TYPES = {"text/csv": "csv", "application/x-ndjson": "ndjson", "application/jsonl": "ndjson"}
+
+
+def _detectar_formato(file: UploadFile, formato: Optional[str]) -> str:
+    """Usa o formato informado ou o deduz pela extensão / content type do arquivo"""
+    if formato:
+        return formato
+    nome = (file.filename or "").lower()
+    for extensao, detectado in EXTENSOES.items():
+        if nome.endswith(extensao):
+            return detectado
+    detectado = CONTENT_TYPES.get((file.content_type or "").split(";")[0].strip())
+    if detectado:
+        return detectado
+    raise HTTPException(
+        status_code=400,
+        detail="Formato não identificado; informe formato=csv ou formato=ndjson"
+    )
+
+
+def _linhas_csv(arquivo) -> Iterator[Tuple[int, Any]]:
+    """Gera (número da linha, dicionário) lendo o CSV sob demanda"""
+    # Decodifica linha a linha: io.TextIOWrapper não aceita o SpooledTemporaryFile
+    # do upload antes do Python 3.11 (falta a interface io, ex.: readable())
+    texto = codecs.iterdecode(arquivo, "utf-8-sig")
+    amostra = next(texto, "")
+    # Extratos exportados no Brasil costumam usar ";" como separador
+    delimitador = ";" if amostra.count(";") > amostra.count(",") else ","
+    leitor = csv.DictReader(_encadear(amostra, texto), delimiter=delimitador)
+    for registro in leitor:
+        yield leitor.line_num, registro
+
+
+def _linhas_ndjson(arquivo) -> Iterator[Tuple[int, Any]]:
+    """Gera (número da linha, objeto) lendo um JSON por linha"""
+    decodificador = codecs.getincrementaldecoder("utf-8-sig")()
+    for numero, bruta in enumerate(arquivo, start=1):
+        linha = decodificador.decode(bruta).strip()
+        if not linha:
+            continue
+        try:
+            yield numero, json.loads(linha)
+        except ValueError as e:
+            yield numero, e
+
+
+def _encadear(primeira: str, restante) -> Iterator[str]:
+    yield primeira
+    yield from restante
+
+
+def _limpar(registro: Dict[str, Any]) -> Dict[str, Any]:
+    """Campos vazios do CSV viram None (ex.: meio de pagamento não informado)"""
+    return {
+        chave.strip(): (None if valor == "" else valor)
+        for chave, valor in registro.items()
+        if chave is not None
+    }
+
+
+def _formatar_erro(e: Exception) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(parte) for parte in erro['loc'])}: {erro['msg']}"
+            for erro in e.errors()
+        )
+    return str(e)
+
+
+def _gravar_bloco(db: Session, bloco: List[Tuple[int, Dict[str, Any]]]) -> Optional[str]:
+    """Insere o bloco com um único INSERT em lote, atualiza o resumo e faz commit"""
+    deltas = {}
+    for _, linha in bloco:
+        acumular_delta(
+            deltas,
+            valor=linha["valor"],
+            categoria=linha["categoria"],
+            meio_pagamento=linha["meio_pagamento"],
+            data_criacao=linha["data_criacao"]
+        )
+    try:
+        # Insert de Core na tabela: um executemany só, sem o agrupamento por
+        # colunas nulas que o bulk insert do ORM faz
+        db.execute(insert(Gasto.__table__), [linha for _, linha in bloco])
+        aplicar_deltas(db, deltas)
+        incrementar_versao(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Erro ao importar bloco de gastos: {e}")
+        return str(e)
+    return None
+
+
+@router.post("/gastos/importar", response_model=ImportacaoResponse)
+def importar_gastos(
+    file: UploadFile = File(...),
+    formato: Optional[Literal["csv", "ndjson"]] = Query(None, description="Deduzido do arquivo quando omitido"),
+    db: Session = Depends(get_db)
+):
+    """
+    Importa gastos em massa a partir de um arquivo CSV ou NDJSON
+
+    Cada linha é validada como `GastoCreate` (mais `data_criacao` opcional).
+    O arquivo é lido sob demanda e gravado em blocos de `IMPORT_CHUNK_SIZE`
+    linhas, com um commit por bloco; linhas inválidas são relatadas na
+    resposta sem interromper a importação.
+    """
+    formato = _detectar_formato(file, formato)
+    linhas = _linhas_csv(file.file) if formato == "csv" else _linhas_ndjson(file.file)
+
+    inicio = time.perf_counter()
+    importados = 0
+    rejeitados = 0
+    erros: List[ErroImportacao] = []
+
+    def rejeitar(numero: int, mensagem: str):
+        nonlocal rejeitados
+        rejeitados += 1
+        if len(erros) < settings.IMPORT_MAX_ERROS:
+            erros.append(ErroImportacao(linha=numero, erro=mensagem))
+
+    def gravar(bloco):
+        nonlocal importados
+        erro = _gravar_bloco(db, bloco)
+        if erro is None:
+            importados += len(bloco)
+        else:
+            for numero, _ in bloco:
+                rejeitar(numero, f"Erro ao gravar: {erro}")
+
+    bloco: List[Tuple[int, Dict[str, Any]]] = []
+    numero = 0
+    agora = datetime.utcnow()
+    try:
+        for numero, registro in linhas:
+            if isinstance(registro, Exception):
+                rejeitar(numero, f"JSON inválido: {registro}")
+                continue
+            if not isinstance(registro, dict):
+                rejeitar(numero, "A linha deve ser um objeto")
+                continue
+
+            try:
+                gasto = GastoImportacao.model_validate(_limpar(registro))
+            except ValidationError as e:
+                rejeitar(numero, _formatar_erro(e))
+                continue
+
+            linha = gasto.model_dump()
+            if linha["data_criacao"] is None:
+                linha["data_criacao"] = agora
+            bloco.append((numero, linha))
+
+            if len(bloco) >= settings.IMPORT_CHUNK_SIZE:
+                gravar(bloco)
+                bloco = []
+                agora = datetime.utcnow()
+
+        if bloco:
+            gravar(bloco)
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Erro de leitura do arquivo: o que já foi gravado permanece
+        if bloco:
+            gravar(bloco)
+        rejeitar(numero + 1, f"Arquivo inválido: {e}")
+
+    duracao = time.perf_counter() - inicio
+    metrics.incrementar("importacao_linhas", importados)
+    metrics.incrementar("importacao_rejeitadas", rejeitados)
+    if importados:
+        metrics.observar("importacao_linhas_por_s", importados / duracao)
+
+    return ImportacaoResponse(importados=importados, rejeitados=rejeitados, erros=erros)
@@ -0,0 +1,70 @@
+"""
+Rotas de processamento de áudio em segundo plano
+
+`POST /api/jobs/processar-audio` só grava o áudio e responde 202 com o id do
+job; o resultado é consultado em `GET /api/jobs/{id}` ou enviado para a
+`callback_url` informada.
+"""
+from typing import Optional
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import ORJSONResponse
+from app.api.processamento import processar_job_audio
+from app.config import settings
+from app.models.schemas import JobResponse
+from app.services.job_service import JobService, job_para_dict, validar_callback_url
+from app.services.transcription_service import content_type_audio
+
+router = APIRouter()
+
+job_service = JobService(
+    processar=processar_job_audio,
+    diretorio=settings.JOBS_DIR,
+    trabalhadores=settings.JOBS_WORKERS,
+    max_fila=settings.JOBS_MAX_FILA,
+    max_tentativas=settings.JOBS_MAX_TENTATIVAS,
+    lease_s=settings.JOBS_LEASE_S
+)
+
+# Retoma os jobs pendentes ao iniciar e para os trabalhadores ao encerrar
+router.add_event_handler("startup", job_service.iniciar)
+router.add_event_handler("shutdown", job_service.encerrar)
+
+
+@router.post("/jobs/processar-audio", response_model=JobResponse, status_code=202)
+async def criar_job_audio(
+    file: UploadFile = File(...),
+    callback_url: Optional[str] = Form(None, description="URL que recebe o job (POST, JSON) quando finalizado")
+):
+    """
+    Aceita um áudio para processamento em segundo plano
+    
+    Responde 202 assim que o áudio é gravado; o cabeçalho `Location` aponta
+    para a rota de consulta do job. Com a fila cheia, responde 503.
+    """
+    if callback_url:
+        motivo = await validar_callback_url(callback_url)
+        if motivo:
+            raise HTTPException(status_code=400, detail=motivo)
+    
+    job = await job_service.criar(
+        arquivo=file,
+        filename=file.filename or "gravacao.webm",
+        content_type=content_type_audio(file.filename, file.content_type),
+        callback_url=callback_url
+    )
+    return ORJSONResponse(
+        job_para_dict(job),
+        status_code=202,
+        headers={"Location": f"/api/jobs/{job.id}"}
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def obter_job(job_id: str):
+    """
+    Situação do job: pendente, processando, concluido (com `resultado`) ou erro
+    """
+    job = await job_service.obter(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return ORJSONResponse(job_para_dict(job))
@@ -1,12 +1,28 @@
 """
 Rotas de processamento de texto e áudio
 """
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List, Tuple
 from fastapi import APIRouter, UploadFile, File, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database.models import get_db, Gasto
-from app.models.schemas import ProcessamentoRequest, ProcessamentoResponse, GastoResponse
-from app.services.transcription_service import TranscriptionService
+from app.core.metrics import metrics
+from app.database.models import get_async_db, Gasto, JobAudio, SessionLocal
+from app.database.resumo import registrar_gastos
+from app.database.versao import incrementar_versao
+from app.models.schemas import (
+    ProcessamentoRequest,
+    ProcessamentoResponse,
+    ProcessamentoLoteRequest,
+    ProcessamentoLoteResponse,
+    GastoResponse
+)
+from app.services.transcription_service import TranscriptionService, content_type_audio
 from app.services.llm_service import LLMService
+from app.services.job_service import concluir_job, guardar_resultado_job
 
 router = APIRouter()
 
@@ -14,18 +30,140 @@ router = APIRouter()
 transcription_service = TranscriptionService()
 llm_service = LLMService()
 
+# Fecha os pools de conexões com o Whisper e o vLLM ao encerrar a aplicação
+router.add_event_handler("shutdown", transcription_service.aclose)
+router.add_event_handler("shutdown", llm_service.aclose)
+
+
+def _salvar_gasto(db: Session, resultado: Dict[str, Any], descricao_original: str) -> GastoResponse:
+    """
+    Persiste o gasto extraído pelo LLM
+    
+    Recebe a sessão síncrona do SQLAlchemy; nas rotas assíncronas é chamada
+    via `AsyncSession.run_sync`, sem bloquear o event loop.
+    """
+    return _salvar_gastos(db, [(resultado, descricao_original)])[0]
+
+
+def _salvar_gastos(db: Session, itens: List[Tuple[Dict[str, Any], str]]) -> List[GastoResponse]:
+    """
+    Persiste vários gastos extraídos pelo LLM em uma única transação
+    
+    Args:
+        itens: Pares (resultado do LLM, texto original)
+    """
+    respostas = _registrar_gastos(db, itens)
+    db.commit()
+    return respostas
+
+
+def _registrar_gastos(db: Session, itens: List[Tuple[Dict[str, Any], str]]) -> List[GastoResponse]:
+    """Adiciona os gastos à sessão, atualizando resumo e versão, sem fazer commit"""
+    gastos_db = [
+        Gasto(
+            valor=resultado["valor"],
+            item=resultado["item"],
+            categoria=resultado["categoria"],
+            meio_pagamento=resultado.get("meio_pagamento"),
+            descricao_original=descricao_original
+        )
+        for resultado, descricao_original in itens
+    ]
+    
+    db.add_all(gastos_db)
+    # O flush gera os ids e datas; as respostas são montadas antes do commit
+    # para evitar um SELECT de refresh por gasto
+    db.flush()
+    registrar_gastos(db, gastos_db)
+    incrementar_versao(db)
+    
+    respostas = [
+        GastoResponse(
+            id=gasto_db.id,
+            valor=gasto_db.valor,
+            item=gasto_db.item,
+            categoria=gasto_db.categoria,
+            meio_pagamento=gasto_db.meio_pagamento,
+            descricao_original=gasto_db.descricao_original,
+            data_criacao=gasto_db.data_criacao
+        )
+        for gasto_db in gastos_db
+    ]
+    
+    return respostas
+
+
+def _salvar_gasto_job(job_id: str, resultado: Dict[str, Any], descricao_original: str) -> Dict[str, Any]:
+    """
+    Conclui o job e grava o gasto na mesma transação
+    
+    O job é concluído primeiro, com UPDATE condicional: se outra tentativa já
+    o finalizou, o gasto não é gravado de novo e vale o resultado já salvo.
+    """
+    with SessionLocal() as db:
+        if not concluir_job(db, job_id):
+            db.rollback()
+            job = db.get(JobAudio, job_id)
+            return json.loads(job.resultado) if job is not None and job.resultado else {}
+        
+        gasto = _registrar_gastos(db, [(resultado, descricao_original)])[0]
+        resposta = ProcessamentoResponse(
+            sucesso=True,
+            gasto=gasto,
+            texto_processado=descricao_original
+        ).model_dump(mode="json")
+        guardar_resultado_job(db, job_id, resposta)
+        db.commit()
+        return resposta
+
+
+async def processar_job_audio(job: JobAudio) -> Dict[str, Any]:
+    """
+    Mesmo fluxo de /processar-audio para um job em segundo plano (ver app/api/jobs.py)
+    
+    Erros de transcrição/LLM indisponível sobem como exceção para o job ser
+    tentado novamente; respostas sem gasto (transcrição vazia, texto sem
+    gasto) concluem o job normalmente.
+    """
+    with open(job.arquivo, "rb") as conteudo:
+        texto_transcrito = await transcription_service.atranscrever(
+            arquivo=UploadFile(conteudo, filename=job.filename),
+            filename=job.filename,
+            content_type=job.content_type
+        )
+    
+    if not texto_transcrito or not texto_transcrito.strip():
+        return ProcessamentoResponse(
+            sucesso=False,
+            erro="transcricao_vazia",
+            texto_processado=""
+        ).model_dump(mode="json")
+    
+    resultado = await llm_service.aprocessar(texto_transcrito)
+    if resultado.get("erro") == "servico_indisponivel":
+        # A transcrição fica no cache: a nova tentativa só repete o LLM
+        raise RuntimeError("servico_indisponivel")
+    if "erro" in resultado:
+        return ProcessamentoResponse(
+            sucesso=False,
+            erro=resultado["erro"],
+            texto_processado=texto_transcrito
+        ).model_dump(mode="json")
+    
+    return await asyncio.to_thread(_salvar_gasto_job, job.id, resultado, texto_transcrito)
+
 
 @router.post("/processar-texto", response_model=ProcessamentoResponse)
 async def processar_texto(
     request: ProcessamentoRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Processa um texto e extrai dados financeiros, salvando no banco de dados
     """
     try:
         # Processa o texto com LLM
-        resultado = llm_service.processar(request.texto)
+        resultado = await llm_service.aprocessar(request.texto)
         
         if "erro" in resultado:
             return ProcessamentoResponse(
@@ -35,27 +173,7 @@ async def processar_texto(
             )
         
         # Cria o gasto no banco de dados
-        gasto_db = Gasto(
-            valor=resultado["valor"],
-            item=resultado["item"],
-            categoria=resultado["categoria"],
-            meio_pagamento=resultado.get("meio_pagamento"),
-            descricao_original=request.texto
-        )
-        
-        db.add(gasto_db)
-        db.commit()
-        db.refresh(gasto_db)
-        
-        gasto_response = GastoResponse(
-            id=gasto_db.id,
-            valor=gasto_db.valor,
-            item=gasto_db.item,
-            categoria=gasto_db.categoria,
-            meio_pagamento=gasto_db.meio_pagamento,
-            descricao_original=gasto_db.descricao_original,
-            data_criacao=gasto_db.data_criacao
-        )
+        gasto_response = await db.run_sync(_salvar_gasto, resultado, request.texto)
         
         return ProcessamentoResponse(
             sucesso=True,
@@ -64,7 +182,7 @@ async def processar_texto(
         )
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return ProcessamentoResponse(
             sucesso=False,
             erro=f"erro_interno: {str(e)}",
@@ -72,36 +190,64 @@ async def processar_texto(
         )
 
 
+@router.post("/processar-lote", response_model=ProcessamentoLoteResponse)
+async def processar_lote(
+    request: ProcessamentoLoteRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Processa vários textos de uma vez, salvando todos os gastos válidos
+    em uma única transação
+    """
+    resultados = await llm_service.aprocessar_lote(request.textos)
+    
+    validos = [i for i, resultado in enumerate(resultados) if "erro" not in resultado]
+    gastos = {}
+    erro_banco = None
+    if validos:
+        try:
+            respostas = await db.run_sync(
+                _salvar_gastos,
+                [(resultados[i], request.textos[i]) for i in validos]
+            )
+            gastos = dict(zip(validos, respostas))
+        except Exception as e:
+            await db.rollback()
+            erro_banco = f"erro_interno: {str(e)}"
+    
+    itens = []
+    for indice, (texto, resultado) in enumerate(zip(request.textos, resultados)):
+        if indice in gastos:
+            itens.append(ProcessamentoResponse(
+                sucesso=True,
+                gasto=gastos[indice],
+                texto_processado=texto
+            ))
+        else:
+            itens.append(ProcessamentoResponse(
+                sucesso=False,
+                erro=resultado.get("erro") or erro_banco,
+                texto_processado=texto
+            ))
+    
+    return ProcessamentoLoteResponse(resultados=itens)
+
+
 @router.post("/processar-audio", response_model=ProcessamentoResponse)
 async def processar_audio(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Processa um arquivo de áudio, transcreve e extrai dados financeiros
     """
     try:
-        # Lê o conteúdo do arquivo
-        file_content = await file.read()
-        
         # Detecta o tipo MIME se não fornecido
-        content_type = file.content_type
-        if not content_type:
-            filename = file.filename or "audio.webm"
-            if filename.endswith(".webm"):
-                content_type = "audio/webm"
-            elif filename.endswith(".mp3"):
-                content_type = "audio/mpeg"
-            elif filename.endswith(".wav"):
-                content_type = "audio/wav"
-            elif filename.endswith(".m4a"):
-                content_type = "audio/mp4"
-            else:
-                content_type = "audio/webm"  # Padrão para gravações do navegador
+        content_type = content_type_audio(file.filename, file.content_type)
         
-        # Transcreve o áudio
-        texto_transcrito = transcription_service.transcrever(
-            file_content=file_content,
+        # Transcreve o áudio (o arquivo é enviado em blocos, sem ser lido inteiro)
+        texto_transcrito = await transcription_service.atranscrever(
+            arquivo=file,
             filename=file.filename or "gravacao.webm",
             content_type=content_type
         )
@@ -114,7 +260,7 @@ async def processar_audio(
             )
         
         # Processa o texto transcrito com LLM
-        resultado = llm_service.processar(texto_transcrito)
+        resultado = await llm_service.aprocessar(texto_transcrito)
         
         if "erro" in resultado:
             return ProcessamentoResponse(
@@ -124,27 +270,7 @@ async def processar_audio(
             )
         
         # Cria o gasto no banco de dados
-        gasto_db = Gasto(
-            valor=resultado["valor"],
-            item=resultado["item"],
-            categoria=resultado["categoria"],
-            meio_pagamento=resultado.get("meio_pagamento"),
-            descricao_original=texto_transcrito
-        )
-        
-        db.add(gasto_db)
-        db.commit()
-        db.refresh(gasto_db)
-        
-        gasto_response = GastoResponse(
-            id=gasto_db.id,
-            valor=gasto_db.valor,
-            item=gasto_db.item,
-            categoria=gasto_db.categoria,
-            meio_pagamento=gasto_db.meio_pagamento,
-            descricao_original=gasto_db.descricao_original,
-            data_criacao=gasto_db.data_criacao
-        )
+        gasto_response = await db.run_sync(_salvar_gasto, resultado, texto_transcrito)
         
         return ProcessamentoResponse(
             sucesso=True,
@@ -153,10 +279,97 @@ async def processar_audio(
         )
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return ProcessamentoResponse(
             sucesso=False,
             erro=f"erro_interno: {str(e)}",
             texto_processado=""
         )
 
+
+def _evento_sse(evento: str, dados: Dict[str, Any]) -> str:
+    """Formata um evento Server-Sent Events"""
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False, default=str)}\n\n"
+
+
+@router.post("/processar-audio/stream")
+async def processar_audio_stream(
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Mesmo processamento de /processar-audio, com o progresso em Server-Sent Events
+    
+    Eventos, na ordem:
+    - `recebido`: upload concluído
+    - `segmento`: cada trecho transcrito, assim que o Whisper o gera
+    - `transcricao`: texto completo
+    - `resultado`: o mesmo ProcessamentoResponse de /processar-audio
+    """
+    filename = file.filename or "gravacao.webm"
+    content_type = content_type_audio(file.filename, file.content_type)
+    
+    async def eventos() -> AsyncIterator[str]:
+        inicio = time.perf_counter()
+        yield _evento_sse("recebido", {"filename": filename, "bytes": file.size})
+        
+        texto_transcrito = ""
+        try:
+            primeiro = True
+            async for evento in transcription_service.atranscrever_stream(
+                arquivo=file,
+                filename=filename,
+                content_type=content_type
+            ):
+                if evento["tipo"] == "segmento":
+                    if primeiro:
+                        metrics.observar("audio_primeiro_segmento_ms", (time.perf_counter() - inicio) * 1000)
+                        primeiro = False
+                    yield _evento_sse("segmento", {
+                        "inicio": evento.get("inicio"),
+                        "fim": evento.get("fim"),
+                        "texto": evento.get("texto", "")
+                    })
+                elif evento["tipo"] == "fim":
+                    texto_transcrito = evento.get("text", "")
+            
+            yield _evento_sse("transcricao", {"texto": texto_transcrito})
+            
+            if not texto_transcrito or not texto_transcrito.strip():
+                resposta = ProcessamentoResponse(
+                    sucesso=False,
+                    erro="transcricao_vazia",
+                    texto_processado=""
+                )
+            else:
+                resultado = await llm_service.aprocessar(texto_transcrito)
+                if "erro" in resultado:
+                    resposta = ProcessamentoResponse(
+                        sucesso=False,
+                        erro=resultado["erro"],
+                        texto_processado=texto_transcrito
+                    )
+                else:
+                    gasto_response = await db.run_sync(_salvar_gasto, resultado, texto_transcrito)
+                    resposta = ProcessamentoResponse(
+                        sucesso=True,
+                        gasto=gasto_response,
+                        texto_processado=texto_transcrito
+                    )
+        
+        except Exception as e:
+            await db.rollback()
+            resposta = ProcessamentoResponse(
+                sucesso=False,
+                erro=f"erro_interno: {getattr(e, 'detail', None) or str(e)}",
+                texto_processado=texto_transcrito
+            )
+        
+        yield _evento_sse("resultado", resposta.model_dump(mode="json"))
+    
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        # Evita que proxies (nginx) segurem os eventos em buffer
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
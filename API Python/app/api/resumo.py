@@ -0,0 +1,107 @@
+"""
+Rotas de resumo (totais agregados) dos gastos
+Leem a tabela resumo_gastos em vez de varrer a tabela de gastos
+"""
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.database.models import get_db, ResumoGasto
+from app.database.resumo import SEM_MEIO_PAGAMENTO
+from app.models.schemas import ResumoResponse, ResumoGrupoResponse
+
+router = APIRouter()
+
+PADRAO_MES = r"^\d{4}-\d{2}$"
+
+
+def _filtros(
+    mes_inicio: Optional[str] = Query(None, pattern=PADRAO_MES, description="AAAA-MM (inclusivo)"),
+    mes_fim: Optional[str] = Query(None, pattern=PADRAO_MES, description="AAAA-MM (inclusivo)"),
+    categoria: Optional[str] = None,
+    meio_pagamento: Optional[str] = None
+) -> list:
+    """Condições comuns a todas as rotas de resumo"""
+    condicoes = []
+    if mes_inicio:
+        condicoes.append(ResumoGasto.mes >= mes_inicio)
+    if mes_fim:
+        condicoes.append(ResumoGasto.mes <= mes_fim)
+    if categoria:
+        condicoes.append(ResumoGasto.categoria == categoria)
+    if meio_pagamento:
+        condicoes.append(ResumoGasto.meio_pagamento == meio_pagamento)
+    return condicoes
+
+
+def _agrupar(db: Session, coluna, condicoes: list) -> List[ResumoGrupoResponse]:
+    linhas = db.execute(
+        select(coluna, func.sum(ResumoGasto.total), func.sum(ResumoGasto.quantidade))
+        .where(*condicoes)
+        .group_by(coluna)
+        .order_by(coluna)
+    ).all()
+    return [
+        ResumoGrupoResponse(
+            grupo=grupo if grupo != SEM_MEIO_PAGAMENTO else None,
+            total=total,
+            quantidade=quantidade
+        )
+        for grupo, total, quantidade in linhas
+    ]
+
+
+@router.get("/gastos/resumo", response_model=List[ResumoResponse])
+def resumo(
+    condicoes: list = Depends(_filtros),
+    db: Session = Depends(get_db)
+):
+    """
+    Totais por mês, categoria e meio de pagamento
+    """
+    linhas = db.query(ResumoGasto).filter(*condicoes).order_by(
+        ResumoGasto.mes, ResumoGasto.categoria, ResumoGasto.meio_pagamento
+    ).all()
+    return [
+        ResumoResponse(
+            mes=linha.mes,
+            categoria=linha.categoria,
+            meio_pagamento=linha.meio_pagamento or None,
+            total=linha.total,
+            quantidade=linha.quantidade
+        )
+        for linha in linhas
+    ]
+
+
+@router.get("/gastos/resumo/mensal", response_model=List[ResumoGrupoResponse])
+def resumo_mensal(
+    condicoes: list = Depends(_filtros),
+    db: Session = Depends(get_db)
+):
+    """
+    Totais por mês
+    """
+    return _agrupar(db, ResumoGasto.mes, condicoes)
+
+
+@router.get("/gastos/resumo/categorias", response_model=List[ResumoGrupoResponse])
+def resumo_categorias(
+    condicoes: list = Depends(_filtros),
+    db: Session = Depends(get_db)
+):
+    """
+    Totais por categoria
+    """
+    return _agrupar(db, ResumoGasto.categoria, condicoes)
+
+
+@router.get("/gastos/resumo/meios-pagamento", response_model=List[ResumoGrupoResponse])
+def resumo_meios_pagamento(
+    condicoes: list = Depends(_filtros),
+    db: Session = Depends(get_db)
+):
+    """
+    Totais por meio de pagamento (grupo nulo = não informado)
+    """
+    return _agrupar(db, ResumoGasto.meio_pagamento, condicoes)
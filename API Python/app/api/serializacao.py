@@ -0,0 +1,44 @@
+"""
+Serialização rápida de gastos
+
+As rotas de gastos montam dicionários direto das linhas do banco e os
+devolvem em uma ORJSONResponse: o FastAPI não revalida nem reconverte a
+resposta (`response_model` fica apenas para a documentação).
+"""
+from typing import Any, Dict, List, Optional, Sequence
+from fastapi import HTTPException
+from app.database.models import Gasto
+from app.models.schemas import GastoResponse
+
+CAMPOS_GASTO = tuple(GastoResponse.model_fields)
+
+
+def campos_solicitados(fields: Optional[str]) -> Sequence[str]:
+    """
+    Converte o parâmetro `fields` ("valor,categoria,data_criacao") na lista de campos
+
+    Sem `fields`, todos os campos de GastoResponse são retornados.
+    """
+    if not fields:
+        return CAMPOS_GASTO
+
+    campos = [campo.strip() for campo in fields.split(",") if campo.strip()]
+    invalidos = [campo for campo in campos if campo not in CAMPOS_GASTO]
+    if invalidos or not campos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos inválidos: {', '.join(invalidos) or fields}. Disponíveis: {', '.join(CAMPOS_GASTO)}"
+        )
+    # Mantém a ordem de GastoResponse e remove repetidos
+    return tuple(campo for campo in CAMPOS_GASTO if campo in campos)
+
+
+def colunas(campos: Sequence[str]) -> List[Any]:
+    """Colunas de Gasto correspondentes aos campos, para um SELECT só do necessário"""
+    return [getattr(Gasto, campo) for campo in campos]
+
+
+def gasto_para_dict(gasto: Any, campos: Sequence[str] = CAMPOS_GASTO) -> Dict[str, Any]:
+    """Dicionário da resposta a partir de um objeto Gasto ou de uma linha do SELECT"""
+    return {campo: getattr(gasto, campo) for campo in campos}
+
@@ -15,6 +15,20 @@ class Settings:
     # Configurações do Whisper
     WHISPER_MODE: Literal["local", "api"] = os.getenv("WHISPER_MODE", "local")
     WHISPER_URL: str = os.getenv("WHISPER_URL", "http://localhost:8000/transcribe")
+    # Rota que envia os segmentos conforme são gerados; vazio usa WHISPER_URL + "/stream"
+    WHISPER_STREAM_URL: str = os.getenv("WHISPER_STREAM_URL", "")
+    WHISPER_CONNECT_TIMEOUT: float = float(os.getenv("WHISPER_CONNECT_TIMEOUT", "5"))
+    WHISPER_READ_TIMEOUT: float = float(os.getenv("WHISPER_READ_TIMEOUT", "60"))
+    WHISPER_MAX_CONNECTIONS: int = int(os.getenv("WHISPER_MAX_CONNECTIONS", "20"))
+    WHISPER_MAX_KEEPALIVE: int = int(os.getenv("WHISPER_MAX_KEEPALIVE", "10"))
+    WHISPER_CHUNK_SIZE: int = int(os.getenv("WHISPER_CHUNK_SIZE", str(64 * 1024)))
+    WHISPER_MODEL: str = os.getenv("WHISPER_MODEL", "small")  # Usado na chave do cache
+    WHISPER_LANGUAGE: str = os.getenv("WHISPER_LANGUAGE", "pt")  # Usado na chave do cache
+    
+    # Cache de transcrições (em disco, pelo hash do áudio)
+    TRANSCRIPTION_CACHE_ENABLED: bool = os.getenv("TRANSCRIPTION_CACHE_ENABLED", "true").lower() == "true"
+    TRANSCRIPTION_CACHE_DIR: str = os.getenv("TRANSCRIPTION_CACHE_DIR", "cache/transcricoes")
+    TRANSCRIPTION_CACHE_MAX_MB: int = int(os.getenv("TRANSCRIPTION_CACHE_MAX_MB", "64"))
     
     # Configurações do LLM
     LLM_MODE: Literal["local", "api"] = os.getenv("LLM_MODE", "local")
@@ -23,8 +37,78 @@ class Settings:
     LLM_API_KEY: str = os.getenv("LLM_API_KEY", "EMPTY")
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "EMPTY")
     
+    # Vários backends (ex.: "local,gemini"): cada chamada vai para o mais rápido
+    # saudável, com hedge após o p95; vazio usa apenas LLM_MODE
+    LLM_BACKENDS: str = os.getenv("LLM_BACKENDS", "")
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+    LLM_HEDGE_MIN_MS: float = float(os.getenv("LLM_HEDGE_MIN_MS", "250"))  # Espera mínima antes do hedge
+    LLM_HEDGE_PADRAO_MS: float = float(os.getenv("LLM_HEDGE_PADRAO_MS", "2000"))  # Enquanto não há histórico
+    LLM_ROUTER_JANELA: int = int(os.getenv("LLM_ROUTER_JANELA", "200"))  # Amostras por backend
+    LLM_ROUTER_MAX_ERROS: float = float(os.getenv("LLM_ROUTER_MAX_ERROS", "0.5"))  # Taxa que pausa o backend
+    LLM_ROUTER_PAUSA_S: float = float(os.getenv("LLM_ROUTER_PAUSA_S", "30"))
+    
+    # Decodificação guiada: a saída do LLM segue o JSON schema de GastoFinanceiro
+    LLM_GUIDED_DECODING: bool = os.getenv("LLM_GUIDED_DECODING", "true").lower() == "true"
+    LLM_MAX_TOKENS: int = int(os.getenv("LLM_MAX_TOKENS", "128"))  # O JSON de um gasto tem ~40 tokens
+    
+    # Lê a resposta em streaming e encerra a geração quando o JSON fecha
+    LLM_STREAMING: bool = os.getenv("LLM_STREAMING", "true").lower() == "true"
+    
+    # Cache de extrações do LLM
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_MAX_MEMORIA: int = int(os.getenv("LLM_CACHE_MAX_MEMORIA", "2048"))  # Entradas no LRU em memória
+    LLM_CACHE_MAX_ENTRADAS: int = int(os.getenv("LLM_CACHE_MAX_ENTRADAS", "100000"))  # Linhas na tabela
+    LLM_CACHE_TTL: int = int(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600)))  # Segundos
+    
+    # Caminho rápido por regras (evita o LLM em frases simples)
+    LLM_FAST_PATH_ENABLED: bool = os.getenv("LLM_FAST_PATH_ENABLED", "true").lower() == "true"
+    LLM_FAST_PATH_CONFIANCA: float = float(os.getenv("LLM_FAST_PATH_CONFIANCA", "0.85"))
+    
+    # Processamento em lote (/api/processar-lote)
+    LLM_BATCH_CONCURRENCY: int = int(os.getenv("LLM_BATCH_CONCURRENCY", "8"))
+    
+    # Micro-lotes: chamadas concorrentes ao vLLM local em uma requisição /v1/completions (0 desativa)
+    LLM_MICROBATCH_JANELA_MS: float = float(os.getenv("LLM_MICROBATCH_JANELA_MS", "0"))
+    LLM_MICROBATCH_MAX: int = int(os.getenv("LLM_MICROBATCH_MAX", "16"))
+    LLM_MICROBATCH_TIMEOUT: float = float(os.getenv("LLM_MICROBATCH_TIMEOUT", "60"))  # Segundos por requisição do lote
+    
+    # Processamento de áudio em segundo plano (/api/jobs)
+    JOBS_DIR: str = os.getenv("JOBS_DIR", "jobs")  # Áudios aguardando processamento
+    JOBS_WORKERS: int = int(os.getenv("JOBS_WORKERS", "2"))  # Jobs processados ao mesmo tempo
+    JOBS_MAX_FILA: int = int(os.getenv("JOBS_MAX_FILA", "100"))  # Acima disso, 503
+    JOBS_MAX_TENTATIVAS: int = int(os.getenv("JOBS_MAX_TENTATIVAS", "3"))
+    # Job em processamento sem sinal de vida há mais que isso é retomado por outro processo
+    JOBS_LEASE_S: float = float(os.getenv("JOBS_LEASE_S", "300"))
+    JOBS_RETENCAO_HORAS: int = int(os.getenv("JOBS_RETENCAO_HORAS", "72"))  # Jobs finalizados mantidos
+    JOBS_CALLBACK_TIMEOUT: float = float(os.getenv("JOBS_CALLBACK_TIMEOUT", "10"))
+    # Hosts aceitos na callback_url, separados por vírgula; vazio: qualquer host público
+    JOBS_CALLBACK_HOSTS: str = os.getenv("JOBS_CALLBACK_HOSTS", "")
+    
+    # Importação em massa (/api/gastos/importar)
+    IMPORT_CHUNK_SIZE: int = int(os.getenv("IMPORT_CHUNK_SIZE", "2000"))  # Linhas por INSERT/commit
+    IMPORT_MAX_ERROS: int = int(os.getenv("IMPORT_MAX_ERROS", "1000"))  # Erros detalhados na resposta
+    
+    # Exportação (/api/gastos/export)
+    EXPORT_CHUNK_SIZE: int = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))  # Linhas lidas do cursor por vez
+    
     # Configurações do Banco de Dados
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./gestor_financeiro.db")
+    # URL do engine assíncrono; vazio deriva de DATABASE_URL (aiosqlite / aiomysql)
+    DATABASE_ASYNC_URL: str = os.getenv("DATABASE_ASYNC_URL", "")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))  # Conexões mantidas abertas
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))  # Conexões extras em picos
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # Espera máxima por uma conexão
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Abaixo do wait_timeout do MySQL
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    
+    # Perfil de desempenho do SQLite (PRAGMAs aplicados a cada conexão)
+    SQLITE_TUNING: bool = os.getenv("SQLITE_TUNING", "true").lower() == "true"
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")  # Leitores não bloqueiam o escritor
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # fsync só no checkpoint (seguro com WAL)
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))  # Espera pelo lock em vez de "database is locked"
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # Bytes lidos via mmap
+    SQLITE_CACHE_SIZE: int = int(os.getenv("SQLITE_CACHE_SIZE", str(-64 * 1024)))  # Negativo = KiB (64 MiB)
+    SQLITE_TEMP_STORE: str = os.getenv("SQLITE_TEMP_STORE", "MEMORY")  # Tabelas/índices temporários
     
     # Configurações da API
     API_TITLE: str = "Gestor Financeiro API"
@@ -2,11 +2,11 @@
 Configuração e criação da aplicação FastAPI
 """
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.database.models import init_db
+from app.database.models import init_db, fechar_conexoes
 import os
 
 
@@ -21,9 +21,13 @@ def create_app() -> FastAPI:
     app = FastAPI(
         title=settings.API_TITLE,
         version=settings.API_VERSION,
-        description=settings.API_DESCRIPTION
+        description=settings.API_DESCRIPTION,
+        default_response_class=ORJSONResponse  # Serialização com orjson em todas as rotas
     )
     
+    # Fecha os pools de conexões com o banco ao encerrar
+    app.add_event_handler("shutdown", fechar_conexoes)
+    
     # Configura CORS
     app.add_middleware(
         CORSMiddleware,
@@ -31,6 +35,7 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
     )
     
     # Middleware para tratar requisições HTTP quando HTTPS está habilitado
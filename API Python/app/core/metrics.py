@@ -0,0 +1,80 @@
+"""
+Métricas em memória da aplicação (contadores e distribuições)
+Expostas em JSON pela rota /metrics
+"""
+import threading
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict
+
+
+class Metrics:
+    """Registro simples e thread-safe de contadores e distribuições de valores"""
+
+    def __init__(self, janela: int = 2048):
+        self._lock = threading.Lock()
+        self._janela = janela
+        self._contadores: Dict[str, float] = defaultdict(float)
+        self._amostras: Dict[str, deque] = {}
+        self._totais: Dict[str, list] = {}
+        self._coletores: Dict[str, Callable[[], Any]] = {}
+
+    def incrementar(self, nome: str, valor: float = 1):
+        """Incrementa um contador"""
+        with self._lock:
+            self._contadores[nome] += valor
+
+    def observar(self, nome: str, valor: float):
+        """Registra uma observação (latência, tamanho de lote, etc.)"""
+        with self._lock:
+            if nome not in self._amostras:
+                self._amostras[nome] = deque(maxlen=self._janela)
+                self._totais[nome] = [0, 0.0]
+            self._amostras[nome].append(valor)
+            self._totais[nome][0] += 1
+            self._totais[nome][1] += valor
+
+    def contador(self, nome: str) -> float:
+        """Valor atual de um contador"""
+        with self._lock:
+            return self._contadores.get(nome, 0)
+
+    def registrar_coletor(self, nome: str, coletor: Callable[[], Any]):
+        """Registra uma função chamada a cada leitura das métricas"""
+        with self._lock:
+            self._coletores[nome] = coletor
+
+    def resumo(self) -> Dict[str, Any]:
+        """Retorna um snapshot de todas as métricas"""
+        with self._lock:
+            contadores = dict(self._contadores)
+            distribuicoes = {
+                nome: self._resumir(amostras, *self._totais[nome])
+                for nome, amostras in self._amostras.items()
+            }
+            coletores = dict(self._coletores)
+
+        return {
+            "contadores": contadores,
+            "distribuicoes": distribuicoes,
+            **{nome: coletor() for nome, coletor in coletores.items()}
+        }
+
+    @staticmethod
+    def _resumir(amostras: deque, total: int, soma: float) -> Dict[str, float]:
+        """Resume uma distribuição pelas amostras mais recentes"""
+        ordenadas = sorted(amostras)
+
+        def percentil(p: float) -> float:
+            return ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))]
+
+        return {
+            "total": total,
+            "media": soma / total if total else 0.0,
+            "p50": percentil(0.50),
+            "p95": percentil(0.95),
+            "p99": percentil(0.99),
+            "max": ordenadas[-1],
+        }
+
+
+metrics = Metrics()
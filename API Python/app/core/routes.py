@@ -4,6 +4,7 @@ Rotas principais da aplicação (root, health, etc.)
 from fastapi import APIRouter
 from fastapi.responses import FileResponse
 from app.config import settings
+from app.core.metrics import metrics
 import os
 
 router = APIRouter()
@@ -31,3 +32,8 @@ async def health_check():
         "llm_mode": settings.LLM_MODE
     }
 
+
+@router.get("/metrics")
+async def obter_metricas():
+    """Métricas internas (cache, latências, contadores)"""
+    return metrics.resumo()
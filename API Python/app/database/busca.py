@@ -0,0 +1,152 @@
+"""
+Busca textual em gastos (item e descricao_original)
+
+- SQLite: tabela FTS5 `gastos_fts` de conteúdo externo, mantida por triggers
+- MySQL: índice FULLTEXT `ft_gastos_busca`
+- Outros bancos (ou SQLite sem FTS5): LIKE, sem índice
+"""
+import re
+import unicodedata
+from typing import Any, List, Sequence
+from sqlalchemy import and_, column, func, inspect, literal_column, or_, select, table, text
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.database.models import Gasto
+
+# Palavras que não ajudam a encontrar um gasto ("todas as compras de farmácia")
+PALAVRAS_IGNORADAS = {
+    "a", "o", "as", "os", "de", "da", "do", "das", "dos", "e", "em", "no", "na",
+    "nos", "nas", "com", "para", "por", "um", "uma", "todo", "toda", "todos", "todas",
+    "meu", "minha", "meus", "minhas"
+}
+
+TABELA_FTS = table("gastos_fts", column("rowid"))
+
+DDL_SQLITE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS gastos_fts USING fts5(
+        item, descricao_original,
+        content='gastos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS gastos_fts_insercao AFTER INSERT ON gastos BEGIN
+        INSERT INTO gastos_fts(rowid, item, descricao_original)
+        VALUES (new.id, new.item, new.descricao_original);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS gastos_fts_remocao AFTER DELETE ON gastos BEGIN
+        INSERT INTO gastos_fts(gastos_fts, rowid, item, descricao_original)
+        VALUES ('delete', old.id, old.item, old.descricao_original);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS gastos_fts_atualizacao AFTER UPDATE OF item, descricao_original ON gastos BEGIN
+        INSERT INTO gastos_fts(gastos_fts, rowid, item, descricao_original)
+        VALUES ('delete', old.id, old.item, old.descricao_original);
+        INSERT INTO gastos_fts(rowid, item, descricao_original)
+        VALUES (new.id, new.item, new.descricao_original);
+    END
+    """,
+]
+
+# "fts5", "fulltext" ou "like"; definido por configurar_busca no init_db
+_modo = "like"
+
+
+def configurar_busca(engine: Engine) -> str:
+    """Cria o índice de texto do banco, se ainda não existir, e retorna o modo de busca"""
+    global _modo
+    dialeto = engine.dialect.name
+    if dialeto == "sqlite":
+        modo = _configurar_sqlite(engine)
+    elif dialeto == "mysql":
+        modo = _configurar_mysql(engine)
+    else:
+        modo = "like"
+    _modo = modo
+    return modo
+
+
+def _configurar_sqlite(engine: Engine) -> str:
+    nova = not inspect(engine).has_table("gastos_fts")
+    try:
+        with engine.begin() as conexao:
+            for ddl in DDL_SQLITE:
+                conexao.execute(text(ddl))
+            if nova:
+                # Indexa os gastos que já existiam
+                conexao.execute(text("INSERT INTO gastos_fts(gastos_fts) VALUES ('rebuild')"))
+    except OperationalError as e:
+        print(f"FTS5 indisponível, busca usará LIKE: {e}")
+        return "like"
+    return "fts5"
+
+
+def _configurar_mysql(engine: Engine) -> str:
+    indices = {indice["name"] for indice in inspect(engine).get_indexes("gastos")}
+    if "ft_gastos_busca" not in indices:
+        with engine.begin() as conexao:
+            conexao.execute(text(
+                "CREATE FULLTEXT INDEX ft_gastos_busca ON gastos (item, descricao_original)"
+            ))
+    return "fulltext"
+
+
+def termos(consulta: str) -> List[str]:
+    """Separa a consulta em termos (letras e números), sem palavras vazias"""
+    palavras = re.findall(r"\w+", unicodedata.normalize("NFC", consulta).casefold())
+    return [p for p in palavras if p not in PALAVRAS_IGNORADAS]
+
+
+def buscar(db: Session, consulta: str, colunas: Sequence[Any], limit: int, skip: int = 0) -> List[Any]:
+    """
+    Linhas (com as `colunas` pedidas) dos gastos que contêm os termos, dos
+    mais relevantes para os menos
+
+    Procura primeiro gastos com todos os termos; se não houver nenhum, aceita
+    qualquer um deles ("compras de farmácia" ainda encontra "Farmácia Pague
+    Menos"). Cada termo também casa como prefixo ("farm" encontra "farmácia").
+    """
+    palavras = termos(consulta)
+    if not palavras:
+        return []
+
+    query = _consulta(palavras, colunas, todos=True)
+    if len(palavras) > 1:
+        existe = db.execute(query.with_only_columns(Gasto.id).order_by(None).limit(1)).first()
+        if existe is None:
+            query = _consulta(palavras, colunas, todos=False)
+
+    return db.execute(query.offset(skip).limit(limit)).all()
+
+
+def _consulta(palavras: List[str], colunas: Sequence[Any], todos: bool):
+    """SELECT dos gastos que casam com todos (ou algum) dos termos, por relevância"""
+    query = select(*colunas)
+    if _modo == "fts5":
+        expressao = (" AND " if todos else " OR ").join(f'"{p}"*' for p in palavras)
+        # Coincidências em item pesam o dobro das em descricao_original
+        relevancia = func.bm25(literal_column("gastos_fts"), 2.0, 1.0)
+        return (
+            query.select_from(Gasto)
+            .join(TABELA_FTS, TABELA_FTS.c.rowid == Gasto.id)
+            .where(literal_column("gastos_fts").op("MATCH")(expressao))
+            .order_by(relevancia, Gasto.id.desc())
+        )
+
+    if _modo == "fulltext":
+        expressao = " ".join(f"{'+' if todos else ''}{p}*" for p in palavras)
+        relevancia = match(Gasto.item, Gasto.descricao_original, against=expressao).in_boolean_mode()
+        return query.where(relevancia).order_by(relevancia.desc(), Gasto.id.desc())
+
+    condicoes = [
+        or_(Gasto.item.ilike(f"%{p}%"), Gasto.descricao_original.ilike(f"%{p}%"))
+        for p in palavras
+    ]
+    combinacao = and_(*condicoes) if todos else or_(*condicoes)
+    return query.where(combinacao).order_by(Gasto.data_criacao.desc(), Gasto.id.desc())
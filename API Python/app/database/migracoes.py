@@ -0,0 +1,189 @@
+"""
+Migrações de esquema
+
+A conversão de `gastos` é executada por scripts/migrar_codificacao.py; na
+inicialização (ver init_db) só é verificada, e a view de relatórios é criada.
+"""
+from sqlalchemy import MetaData, Table, case, delete, func, inspect, insert, select, text
+from sqlalchemy.engine import Engine
+from app.database.models import (
+    CATEGORIAS,
+    MEIOS_PAGAMENTO,
+    Categoria,
+    Gasto,
+    MeioPagamento,
+    ResumoGasto,
+    _popular_consultas
+)
+
+
+TABELA_ANTIGA = "gastos_antigos"
+VISAO_GASTOS = "gastos_detalhados"
+
+
+def _formato_antigo(engine: Engine) -> bool:
+    """True se `gastos` ainda tem categoria/meio_pagamento em texto"""
+    inspetor = inspect(engine)
+    if not inspetor.has_table("gastos"):
+        return False
+    colunas = {coluna["name"] for coluna in inspetor.get_columns("gastos")}
+    return "categoria" in colunas and "categoria_id" not in colunas
+
+
+def verificar_codificacao(engine: Engine):
+    """
+    Impede a inicialização enquanto a conversão de `gastos` não terminou
+
+    A conversão reescreve a tabela principal e, no MySQL, cada DDL é
+    confirmado na hora: ela não roda mais automaticamente na inicialização
+    (vários workers subindo juntos disputariam o RENAME), e sim pelo script
+    `scripts/migrar_codificacao.py`.
+
+    Raises:
+        RuntimeError: Se o banco está no formato antigo ou se uma conversão
+            anterior foi interrompida (`gastos_antigos` ainda existe)
+    """
+    if inspect(engine).has_table(TABELA_ANTIGA):
+        raise RuntimeError(
+            f"A tabela '{TABELA_ANTIGA}' existe: a conversão de gastos foi interrompida. "
+            "Rode 'python scripts/migrar_codificacao.py' para concluí-la."
+        )
+    if _formato_antigo(engine):
+        raise RuntimeError(
+            "A tabela 'gastos' está no formato antigo (categoria/meio_pagamento em texto). "
+            "Rode 'python scripts/migrar_codificacao.py' antes de iniciar a aplicação."
+        )
+
+
+def migrar_codificacao(engine: Engine) -> bool:
+    """
+    Converte `gastos.categoria` / `gastos.meio_pagamento` de texto para ids
+    das tabelas de consulta (`categoria_id` / `meio_pagamento_id`)
+
+    A tabela antiga é renomeada para `gastos_antigos`, a nova é criada com o
+    esquema atual e os dados são copiados com um único INSERT ... SELECT.
+    Categorias fora da lista viram "Outros" e meios de pagamento desconhecidos
+    viram NULL; por isso o resumo é esvaziado (o init_db o recalcula).
+
+    Pode ser executada de novo se for interrompida: enquanto `gastos_antigos`
+    existir, a cópia é refeita do zero, e a tabela antiga só é removida depois
+    de a contagem de linhas das duas tabelas conferir.
+
+    Returns:
+        False se não havia nada a converter
+
+    Raises:
+        RuntimeError: Se a contagem de linhas copiadas não conferir
+    """
+    inspetor = inspect(engine)
+    if _formato_antigo(engine):
+        if inspetor.has_table(TABELA_ANTIGA):
+            raise RuntimeError(
+                f"'gastos' está no formato antigo e '{TABELA_ANTIGA}' também existe; "
+                "verifique as duas tabelas manualmente"
+            )
+        print("Renomeando gastos para gastos_antigos...")
+        with engine.begin() as conexao:
+            # A view depende de `gastos`; o init_db a recria
+            if VISAO_GASTOS in inspetor.get_view_names():
+                conexao.execute(text(f"DROP VIEW {VISAO_GASTOS}"))
+            antiga = Table("gastos", MetaData(), autoload_with=conexao)
+            # Nomes de índice são globais no SQLite: libera-os para a tabela nova
+            for indice in antiga.indexes:
+                indice.drop(conexao)
+            conexao.execute(text(f"ALTER TABLE gastos RENAME TO {TABELA_ANTIGA}"))
+    elif not inspetor.has_table(TABELA_ANTIGA):
+        return False
+
+    print("Copiando gastos para o formato com tabelas de consulta...")
+    with engine.begin() as conexao:
+        Categoria.__table__.create(conexao, checkfirst=True)
+        MeioPagamento.__table__.create(conexao, checkfirst=True)
+        _popular_consultas(conexao)
+        Gasto.__table__.create(conexao, checkfirst=True)
+
+    with engine.begin() as conexao:
+        antiga = Table(TABELA_ANTIGA, MetaData(), autoload_with=conexao)
+        tabela = Gasto.__table__
+        categoria_id = case(
+            {nome: i for i, nome in enumerate(CATEGORIAS, start=1)},
+            value=antiga.c.categoria,
+            else_=CATEGORIAS.index("Outros") + 1
+        )
+        meio_pagamento_id = case(
+            {nome: i for i, nome in enumerate(MEIOS_PAGAMENTO, start=1)},
+            value=antiga.c.meio_pagamento,
+            else_=None
+        )
+        # Só DML nesta transação: uma cópia interrompida não deixa linhas pela metade
+        conexao.execute(delete(tabela))
+        conexao.execute(
+            insert(tabela).from_select(
+                [
+                    tabela.c.id,
+                    tabela.c.valor,
+                    tabela.c.item,
+                    tabela.c.categoria,
+                    tabela.c.meio_pagamento,
+                    tabela.c.descricao_original,
+                    tabela.c.data_criacao
+                ],
+                select(
+                    antiga.c.id,
+                    antiga.c.valor,
+                    antiga.c.item,
+                    categoria_id,
+                    meio_pagamento_id,
+                    antiga.c.descricao_original,
+                    antiga.c.data_criacao
+                )
+            )
+        )
+
+    with engine.connect() as conexao:
+        antigas = conexao.execute(select(func.count()).select_from(antiga)).scalar_one()
+        copiadas = conexao.execute(select(func.count()).select_from(Gasto.__table__)).scalar_one()
+    if antigas != copiadas:
+        raise RuntimeError(
+            f"{copiadas} de {antigas} gastos copiados; '{TABELA_ANTIGA}' foi mantida"
+        )
+
+    with engine.begin() as conexao:
+        if inspetor.has_table(ResumoGasto.__tablename__):
+            conexao.execute(delete(ResumoGasto))
+        antiga.drop(conexao)
+    print(f"{copiadas} gastos convertidos; '{TABELA_ANTIGA}' removida")
+    return True
+
+
+def criar_visao_gastos(engine: Engine):
+    """
+    Cria a view `gastos_detalhados`, com as colunas de `gastos` no formato
+    anterior à migração acima (categoria e meio_pagamento como texto)
+
+    Relatórios externos que liam `gastos` diretamente (perguntas e painéis
+    do Metabase) passam a usar esta view sem precisar de joins.
+    Não faz nada se a view já existir.
+    """
+    if VISAO_GASTOS in inspect(engine).get_view_names():
+        return
+
+    gastos = Gasto.__table__
+    categorias = Categoria.__table__
+    meios = MeioPagamento.__table__
+    consulta = select(
+        gastos.c.id,
+        gastos.c.valor,
+        gastos.c.item,
+        categorias.c.nome.label("categoria"),
+        meios.c.nome.label("meio_pagamento"),
+        gastos.c.descricao_original,
+        gastos.c.data_criacao
+    ).select_from(
+        gastos
+        .join(categorias, categorias.c.id == gastos.c.categoria)
+        .outerjoin(meios, meios.c.id == gastos.c.meio_pagamento)
+    )
+    sql = consulta.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    with engine.begin() as conexao:
+        conexao.execute(text(f"CREATE VIEW {VISAO_GASTOS} AS {sql}"))
@@ -1,15 +1,71 @@
 """
 Modelos de banco de dados (ORM)
 """
+import time
 from datetime import datetime
-from sqlalchemy import Column, Integer, Float, String, DateTime, Text
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from sqlalchemy import (
+    Column, Integer, SmallInteger, Float, String, DateTime, Text, Index, ForeignKey,
+    TypeDecorator, event, insert, select
+)
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlalchemy import create_engine
 from app.config import settings
+from app.core.metrics import metrics
 
 Base = declarative_base()
 
+# Valores das tabelas de domínio; o id é a posição (1, 2, ...) na tupla.
+# Novos valores devem ser acrescentados sempre ao final.
+CATEGORIAS: Tuple[str, ...] = ("Alimentação", "Transporte", "Lazer", "Saúde", "Moradia", "Outros", "Bebida")
+MEIOS_PAGAMENTO: Tuple[str, ...] = ("Crédito", "Débito", "Refeição", "Pix")
+
+
+class Codificado(TypeDecorator):
+    """
+    Armazena um valor de domínio como o id (SMALLINT) da sua tabela de consulta
+    
+    Para o restante da aplicação a coluna continua sendo uma string: a conversão
+    acontece na gravação, nos filtros e na leitura.
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, valores: Tuple[str, ...]):
+        super().__init__()
+        self.valores = valores
+        self._ids = {valor: i for i, valor in enumerate(valores, start=1)}
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        try:
+            return self._ids[value]
+        except KeyError:
+            raise ValueError(f"Valor desconhecido: {value!r}")
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else self.valores[value - 1]
+
+
+class Categoria(Base):
+    """Tabela de consulta das categorias"""
+    __tablename__ = "categorias"
+    
+    id = Column(SmallInteger, primary_key=True, autoincrement=False)
+    nome = Column(String(50), nullable=False, unique=True)
+
+
+class MeioPagamento(Base):
+    """Tabela de consulta dos meios de pagamento"""
+    __tablename__ = "meios_pagamento"
+    
+    id = Column(SmallInteger, primary_key=True, autoincrement=False)
+    nome = Column(String(50), nullable=False, unique=True)
+
 
 class Gasto(Base):
     """Modelo de tabela para gastos financeiros"""
@@ -18,24 +74,244 @@ class Gasto(Base):
     id = Column(Integer, primary_key=True, index=True)
     valor = Column(Float, nullable=False)
     item = Column(String(255), nullable=False)
-    categoria = Column(String(50), nullable=False)
-    meio_pagamento = Column(String(50), nullable=True)
+    # Guardados como ids das tabelas de consulta, expostos como strings
+    categoria = Column(
+        "categoria_id", Codificado(CATEGORIAS), ForeignKey("categorias.id"),
+        key="categoria", nullable=False
+    )
+    meio_pagamento = Column(
+        "meio_pagamento_id", Codificado(MEIOS_PAGAMENTO), ForeignKey("meios_pagamento.id"),
+        key="meio_pagamento", nullable=True
+    )
     descricao_original = Column(Text, nullable=True)  # Texto original que gerou o gasto
     data_criacao = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        # Paginação por cursor em (data_criacao, id)
+        Index("ix_gastos_data_criacao_id", "data_criacao", "id"),
+    )
+
+
+class ResumoGasto(Base):
+    """
+    Totais agregados por mês, categoria e meio de pagamento
+    
+    Mantido incrementalmente na mesma transação de cada escrita em `gastos`
+    (ver app/database/resumo.py).
+    """
+    __tablename__ = "resumo_gastos"
+    
+    mes = Column(String(7), primary_key=True)  # AAAA-MM
+    categoria = Column(String(50), primary_key=True)
+    meio_pagamento = Column(String(50), primary_key=True)  # "" quando não informado
+    total = Column(Float, nullable=False, default=0.0)
+    quantidade = Column(Integer, nullable=False, default=0)
+
+
+class VersaoDados(Base):
+    """
+    Contador de versão de uma tabela, incrementado na mesma transação de cada escrita
+    
+    Base do ETag/Last-Modified das rotas de leitura (ver app/database/versao.py).
+    """
+    __tablename__ = "versao_dados"
+    
+    tabela = Column(String(50), primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
+    atualizado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class JobAudio(Base):
+    """Áudio enviado para processamento em segundo plano (ver app/services/job_service.py)"""
+    __tablename__ = "jobs_audio"
+    
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    status = Column(String(20), nullable=False, default="pendente", index=True)  # pendente, processando, concluido, erro
+    arquivo = Column(String(500), nullable=False)  # Caminho do áudio em JOBS_DIR
+    filename = Column(String(255), nullable=False)
+    content_type = Column(String(100), nullable=False)
+    callback_url = Column(String(500), nullable=True)  # Recebe o job (POST) quando finalizado
+    tentativas = Column(Integer, nullable=False, default=0)
+    erro = Column(Text, nullable=True)
+    resultado = Column(Text, nullable=True)  # ProcessamentoResponse (JSON)
+    criado_em = Column(DateTime, default=datetime.utcnow, nullable=False)
+    atualizado_em = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class CacheExtracao(Base):
+    """Cache persistente das extrações feitas pelo LLM"""
+    __tablename__ = "cache_extracoes"
+    
+    chave = Column(String(64), primary_key=True)  # sha256 do texto normalizado + versão
+    versao = Column(String(64), nullable=False, index=True)  # Modelo + prompt usados
+    resultado = Column(Text, nullable=False)  # Dicionário retornado pelo LLMService (JSON)
+    criado_em = Column(DateTime, default=datetime.utcnow, nullable=False)
+    acessado_em = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
 
 # Configuração do banco de dados
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+class PoolMedido(QueuePool):
+    """QueuePool que registra quanto tempo cada checkout esperou por uma conexão"""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observar("db_pool_espera_ms", (time.perf_counter() - inicio) * 1000)
+
+
+class PoolMedidoAssincrono(AsyncAdaptedQueuePool, PoolMedido):
+    """Versão de PoolMedido para o engine assíncrono"""
+
+
+def _url_assincrona(url: str) -> str:
+    """Troca o driver síncrono pelo equivalente assíncrono"""
+    esquema, _, resto = url.partition("://")
+    dialeto = esquema.split("+")[0]
+    drivers = {"sqlite": "sqlite+aiosqlite", "mysql": "mysql+aiomysql", "postgresql": "postgresql+asyncpg"}
+    if dialeto not in drivers:
+        raise ValueError(f"Sem driver assíncrono conhecido para '{esquema}'; defina DATABASE_ASYNC_URL")
+    return f"{drivers[dialeto]}://{resto}"
+
+
+def _opcoes_engine(url: str, assincrono: bool) -> Dict[str, Any]:
+    """Parâmetros de pool (e de conexão) comuns aos engines síncrono e assíncrono"""
+    opcoes: Dict[str, Any] = {}
+    if url.startswith("sqlite"):
+        if not assincrono:
+            opcoes["connect_args"] = {"check_same_thread": False}
+        if ":memory:" in url or url.split("://", 1)[1] in ("", "/"):
+            # Banco em memória: mantém o pool padrão (uma conexão por thread)
+            return opcoes
+
+    opcoes.update(
+        poolclass=PoolMedidoAssincrono if assincrono else PoolMedido,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING
+    )
+    return opcoes
+
+
+def _pragmas_sqlite() -> Dict[str, Any]:
+    """PRAGMAs do perfil de desempenho do SQLite, na ordem em que são aplicados"""
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "temp_store": settings.SQLITE_TEMP_STORE
+    }
+
+
+def _configurar_sqlite(engine_sincrono):
+    """Aplica os PRAGMAs a cada nova conexão SQLite do engine"""
+    if engine_sincrono.dialect.name != "sqlite" or not settings.SQLITE_TUNING:
+        return
+
+    pragmas = _pragmas_sqlite()
+
+    @event.listens_for(engine_sincrono, "connect")
+    def _aplicar_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for nome, valor in pragmas.items():
+                cursor.execute(f"PRAGMA {nome}={valor}")
+        finally:
+            cursor.close()
+
+
+engine = create_engine(settings.DATABASE_URL, **_opcoes_engine(settings.DATABASE_URL, assincrono=False))
+_configurar_sqlite(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine assíncrono, criado no primeiro uso (o driver só é importado se necessário)
+_async_engine: Optional[AsyncEngine] = None
+_AsyncSessionLocal: Optional[async_sessionmaker] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """Engine assíncrono (aiosqlite/aiomysql) com as mesmas configurações de pool"""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        url = settings.DATABASE_ASYNC_URL or _url_assincrona(settings.DATABASE_URL)
+        _async_engine = create_async_engine(url, **_opcoes_engine(url, assincrono=True))
+        _configurar_sqlite(_async_engine.sync_engine)
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine,
+            autoflush=False,
+            expire_on_commit=False
+        )
+    return _async_engine
+
+
+def _estado_pool(pool) -> Dict[str, Any]:
+    if not isinstance(pool, QueuePool):
+        return {"tipo": type(pool).__name__}
+    return {
+        "tamanho": pool.size(),
+        "em_uso": pool.checkedout(),
+        "livres": pool.checkedin(),
+        "overflow": pool.overflow()
+    }
+
+
+metrics.registrar_coletor("db_pool", lambda: {
+    "sincrono": _estado_pool(engine.pool),
+    "assincrono": _estado_pool(_async_engine.pool) if _async_engine is not None else None
+})
+
+
+def _popular_consultas(conexao):
+    """Insere nas tabelas de consulta os valores que ainda não existem"""
+    for tabela, valores in ((Categoria.__table__, CATEGORIAS), (MeioPagamento.__table__, MEIOS_PAGAMENTO)):
+        existentes = set(conexao.execute(select(tabela.c.id)).scalars())
+        novos = [
+            {"id": i, "nome": nome}
+            for i, nome in enumerate(valores, start=1)
+            if i not in existentes
+        ]
+        if novos:
+            conexao.execute(insert(tabela), novos)
+
 
 def init_db():
     """Inicializa o banco de dados criando as tabelas"""
+    # Bancos antigos (categoria/meio_pagamento em texto) precisam ser convertidos
+    # antes por scripts/migrar_codificacao.py; senão a inicialização falha aqui
+    from app.database.migracoes import criar_visao_gastos, verificar_codificacao
+    verificar_codificacao(engine)
+    
     Base.metadata.create_all(bind=engine)
+    
+    # Valores das tabelas de consulta e contador de versão dos gastos
+    from app.database.versao import criar_versoes
+    with engine.begin() as conexao:
+        _popular_consultas(conexao)
+        criar_versoes(conexao)
+    
+    # Colunas de texto do formato antigo, para relatórios (Metabase)
+    criar_visao_gastos(engine)
+    
+    # Índice de texto para /api/gastos/busca (FTS5 / FULLTEXT)
+    from app.database.busca import configurar_busca
+    configurar_busca(engine)
+    
+    # create_all não cria índices novos em tabelas que já existem
+    for tabela in Base.metadata.sorted_tables:
+        for indice in tabela.indexes:
+            indice.create(bind=engine, checkfirst=True)
+    
+    # Preenche o resumo a partir dos gastos existentes (primeira execução)
+    from app.database.resumo import reconstruir_resumo
+    with SessionLocal() as db:
+        if db.query(ResumoGasto).first() is None and db.query(Gasto).first() is not None:
+            reconstruir_resumo(db)
 
 
 def get_db():
@@ -46,3 +322,21 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Dependency para obter uma sessão assíncrona do banco de dados
+    
+    Código síncrono existente pode ser reaproveitado com `await db.run_sync(func, ...)`.
+    """
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
+
+
+async def fechar_conexoes():
+    """Fecha os pools de conexões (chamado no encerramento da aplicação)"""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    engine.dispose()
+
@@ -0,0 +1,148 @@
+"""
+Manutenção incremental da tabela de resumo (resumo_gastos)
+
+Cada escrita em `gastos` acumula deltas por (mês, categoria, meio de pagamento)
+e os aplica com `aplicar_deltas` antes do commit, na mesma transação.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+from app.database.models import Gasto, ResumoGasto
+
+# (mes, categoria, meio_pagamento) -> [total, quantidade]
+Deltas = Dict[Tuple[str, str, str], list]
+
+SEM_MEIO_PAGAMENTO = ""
+
+
+def acumular_delta(
+    deltas: Deltas,
+    valor: float,
+    categoria: str,
+    meio_pagamento: Optional[str],
+    data_criacao: datetime,
+    sinal: int = 1
+):
+    """Soma (sinal=1) ou subtrai (sinal=-1) um gasto dos deltas pendentes"""
+    chave = (data_criacao.strftime("%Y-%m"), categoria, meio_pagamento or SEM_MEIO_PAGAMENTO)
+    delta = deltas.setdefault(chave, [0.0, 0])
+    delta[0] += sinal * valor
+    delta[1] += sinal
+
+
+def acumular_gasto(deltas: Deltas, gasto: Gasto, sinal: int = 1):
+    """`acumular_delta` a partir de um objeto Gasto (já com data_criacao preenchida)"""
+    acumular_delta(
+        deltas,
+        valor=gasto.valor,
+        categoria=gasto.categoria,
+        meio_pagamento=gasto.meio_pagamento,
+        data_criacao=gasto.data_criacao,
+        sinal=sinal
+    )
+
+
+def registrar_gastos(db: Session, gastos: Iterable[Gasto], sinal: int = 1):
+    """Aplica ao resumo a inclusão (ou remoção, com sinal=-1) dos gastos"""
+    deltas: Deltas = {}
+    for gasto in gastos:
+        acumular_gasto(deltas, gasto, sinal)
+    aplicar_deltas(db, deltas)
+
+
+def aplicar_deltas(db: Session, deltas: Deltas):
+    """Atualiza as linhas do resumo com os deltas, sem fazer commit"""
+    linhas = [
+        {
+            "mes": mes,
+            "categoria": categoria,
+            "meio_pagamento": meio_pagamento,
+            "total": total,
+            "quantidade": quantidade
+        }
+        for (mes, categoria, meio_pagamento), (total, quantidade) in deltas.items()
+        if quantidade != 0 or total != 0
+    ]
+    if not linhas:
+        return
+
+    # Um único upsert executado em lote (executemany) para todos os grupos
+    dialeto = db.get_bind().dialect.name
+    if dialeto in ("sqlite", "postgresql"):
+        if dialeto == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(ResumoGasto)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["mes", "categoria", "meio_pagamento"],
+            set_={
+                "total": ResumoGasto.total + stmt.excluded.total,
+                "quantidade": ResumoGasto.quantidade + stmt.excluded.quantidade
+            }
+        ), linhas)
+    elif dialeto == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(ResumoGasto)
+        db.execute(stmt.on_duplicate_key_update(
+            total=ResumoGasto.total + stmt.inserted.total,
+            quantidade=ResumoGasto.quantidade + stmt.inserted.quantidade
+        ), linhas)
+    else:
+        for valores in linhas:
+            atualizado = db.execute(
+                update(ResumoGasto)
+                .where(
+                    ResumoGasto.mes == valores["mes"],
+                    ResumoGasto.categoria == valores["categoria"],
+                    ResumoGasto.meio_pagamento == valores["meio_pagamento"]
+                )
+                .values(
+                    total=ResumoGasto.total + valores["total"],
+                    quantidade=ResumoGasto.quantidade + valores["quantidade"]
+                )
+            )
+            if atualizado.rowcount == 0:
+                db.add(ResumoGasto(**valores))
+                db.flush()
+
+    if any(valores["quantidade"] < 0 for valores in linhas):
+        # Remove grupos que ficaram vazios
+        db.execute(delete(ResumoGasto).where(ResumoGasto.quantidade <= 0))
+
+
+def _expressao_mes(dialeto: str):
+    """Expressão SQL que formata data_criacao como AAAA-MM"""
+    if dialeto == "mysql":
+        return func.date_format(Gasto.data_criacao, "%Y-%m")
+    if dialeto == "postgresql":
+        return func.to_char(Gasto.data_criacao, "YYYY-MM")
+    return func.strftime("%Y-%m", Gasto.data_criacao)
+
+
+def reconstruir_resumo(db: Session):
+    """Recalcula todo o resumo a partir da tabela de gastos (faz commit)"""
+    mes = _expressao_mes(db.get_bind().dialect.name).label("mes")
+    linhas = db.execute(
+        select(
+            mes,
+            Gasto.categoria,
+            Gasto.meio_pagamento,
+            func.sum(Gasto.valor),
+            func.count()
+        ).group_by(mes, Gasto.categoria, Gasto.meio_pagamento)
+    ).all()
+
+    db.execute(delete(ResumoGasto))
+    db.add_all([
+        ResumoGasto(
+            mes=linha[0],
+            categoria=linha[1],
+            meio_pagamento=linha[2] or SEM_MEIO_PAGAMENTO,
+            total=linha[3],
+            quantidade=linha[4]
+        )
+        for linha in linhas
+    ])
+    db.commit()
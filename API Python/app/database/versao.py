@@ -0,0 +1,45 @@
+"""
+Versão dos dados de gastos (tabela versao_dados)
+
+Toda escrita em `gastos` chama `incrementar_versao` antes do commit, na mesma
+transação. As rotas de leitura usam a versão como ETag e a data da última
+alteração como Last-Modified, respondendo 304 sem consultar os gastos.
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from app.database.models import VersaoDados
+
+TABELA_GASTOS = "gastos"
+
+
+def criar_versoes(conexao):
+    """Cria a linha do contador de gastos, se ainda não existir"""
+    existe = conexao.execute(
+        select(VersaoDados.tabela).where(VersaoDados.tabela == TABELA_GASTOS)
+    ).first()
+    if existe is None:
+        conexao.execute(insert(VersaoDados).values(
+            tabela=TABELA_GASTOS,
+            versao=0,
+            atualizado_em=datetime.utcnow()
+        ))
+
+
+def incrementar_versao(db: Session):
+    """Marca que os gastos mudaram, sem fazer commit"""
+    db.execute(
+        update(VersaoDados)
+        .where(VersaoDados.tabela == TABELA_GASTOS)
+        .values(versao=VersaoDados.versao + 1, atualizado_em=datetime.utcnow())
+    )
+
+
+def obter_versao(db: Session) -> Tuple[int, Optional[datetime]]:
+    """Versão atual dos gastos e a data da última alteração"""
+    linha = db.execute(
+        select(VersaoDados.versao, VersaoDados.atualizado_em)
+        .where(VersaoDados.tabela == TABELA_GASTOS)
+    ).first()
+    return (linha.versao, linha.atualizado_em) if linha else (0, None)
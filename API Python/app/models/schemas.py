@@ -1,8 +1,9 @@
 """
 Modelos Pydantic para validação de entrada/saída da API
 """
-from typing import Optional, Literal
-from datetime import datetime
+import re
+from typing import List, Optional, Literal
+from datetime import date, datetime, time
 from pydantic import BaseModel, Field, field_validator
 
 
@@ -31,6 +32,53 @@ class GastoCreate(BaseModel):
     descricao_original: Optional[str] = None  # Texto original que gerou o gasto
 
 
+class GastoImportacao(GastoCreate):
+    """Linha de um arquivo de importação (CSV ou NDJSON)"""
+    data_criacao: Optional[datetime] = None  # Data original do gasto (padrão: agora)
+
+    @field_validator("valor", mode="before")
+    def valor_decimal_brasileiro(cls, v):
+        # Extratos costumam vir como "1.234,56"; "1234.56" é aceito como está.
+        # Qualquer outra forma ("1,234.56") é ambígua e a linha é rejeitada
+        if not isinstance(v, str):
+            return v
+        texto = v.strip()
+        if re.fullmatch(r"-?\d{1,3}(\.\d{3})*,\d+|-?\d+,\d+", texto):
+            return texto.replace(".", "").replace(",", ".")
+        if re.fullmatch(r"-?\d+(\.\d+)?", texto):
+            return texto
+        raise ValueError(f"Valor inválido: {v!r} (use 1234.56 ou 1.234,56)")
+
+    @field_validator("data_criacao", mode="before")
+    def data_brasileira(cls, v):
+        # Extratos trazem só a data ("2024-01-05"), no formato "05/01/2024"
+        # ou com hora ("05/01/2024 08:30"); sem hora, vale meia-noite
+        if isinstance(v, date) and not isinstance(v, datetime):
+            return datetime.combine(v, time())
+        if not isinstance(v, str):
+            return v
+        texto = v.strip()
+        brasileira = re.fullmatch(r"(\d{1,2})/(\d{1,2})/(\d{4})(?:[ T](\d{1,2}):(\d{2})(?::(\d{2}))?)?", texto)
+        try:
+            if brasileira:
+                dia, mes, ano, hora, minuto, segundo = brasileira.groups()
+                return datetime(
+                    int(ano), int(mes), int(dia),
+                    int(hora or 0), int(minuto or 0), int(segundo or 0)
+                )
+            if re.fullmatch(r"\d{4}-\d{2}-\d{2}", texto):
+                return datetime.combine(date.fromisoformat(texto), time())
+        except ValueError:
+            raise ValueError(f"Data inválida: {texto!r}")
+        return texto
+
+    @field_validator("valor")
+    def valor_positivo(cls, v):
+        if v <= 0:
+            raise ValueError("O valor deve ser maior que zero")
+        return v
+
+
 class GastoUpdate(BaseModel):
     """Modelo para atualização de gasto via API"""
     valor: Optional[float] = None
@@ -72,3 +120,52 @@ class ProcessamentoResponse(BaseModel):
     erro: Optional[str] = None
     texto_processado: Optional[str] = None
 
+
+class JobResponse(BaseModel):
+    """Situação de um processamento de áudio em segundo plano"""
+    id: str
+    status: Literal["pendente", "processando", "concluido", "erro"]
+    tentativas: int
+    erro: Optional[str] = None
+    resultado: Optional[ProcessamentoResponse] = None
+    criado_em: datetime
+    atualizado_em: datetime
+
+
+class ProcessamentoLoteRequest(BaseModel):
+    """Modelo para requisição de processamento de vários textos"""
+    textos: List[str] = Field(min_length=1, max_length=100)
+
+
+class ProcessamentoLoteResponse(BaseModel):
+    """Modelo de resposta do processamento em lote (um resultado por texto)"""
+    resultados: List[ProcessamentoResponse]
+
+
+class ResumoResponse(BaseModel):
+    """Linha do resumo agregado por mês, categoria e meio de pagamento"""
+    mes: str
+    categoria: str
+    meio_pagamento: Optional[str]
+    total: float
+    quantidade: int
+
+
+class ResumoGrupoResponse(BaseModel):
+    """Total agregado de um grupo (mês, categoria ou meio de pagamento)"""
+    grupo: Optional[str]
+    total: float
+    quantidade: int
+
+
+class ErroImportacao(BaseModel):
+    """Linha rejeitada na importação"""
+    linha: int
+    erro: str
+
+
+class ImportacaoResponse(BaseModel):
+    """Resultado da importação em massa"""
+    importados: int
+    rejeitados: int
+    erros: List[ErroImportacao]  # Limitado a IMPORT_MAX_ERROS
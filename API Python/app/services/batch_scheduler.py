@@ -0,0 +1,91 @@
+"""
+Agendador de micro-lotes
+Agrupa chamadas concorrentes dentro de uma janela de tempo e as despacha juntas
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+from app.core.metrics import metrics
+
+
+class MicroBatchScheduler:
+    """
+    Junta itens submetidos em paralelo e executa `executar_lote` uma vez por grupo
+
+    Um lote é despachado quando a janela (`janela_ms`) desde o primeiro item
+    expira ou quando `max_lote` itens estão aguardando, o que ocorrer primeiro.
+    Cada chamador recebe o resultado correspondente ao seu item.
+    """
+
+    def __init__(
+        self,
+        executar_lote: Callable[[List[Any]], Awaitable[List[Any]]],
+        janela_ms: float,
+        max_lote: int,
+        nome: str = "llm_microlote"
+    ):
+        """
+        Args:
+            executar_lote: Recebe a lista de itens e retorna os resultados na mesma ordem
+            janela_ms: Tempo máximo que o primeiro item do lote espera por companhia
+            max_lote: Quantidade máxima de itens por lote
+            nome: Prefixo das métricas
+        """
+        self.executar_lote = executar_lote
+        self.janela = janela_ms / 1000
+        self.max_lote = max_lote
+        self.nome = nome
+        self._fila: List[Tuple[Any, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tarefas: set = set()
+
+    async def submeter(self, item: Any) -> Any:
+        """Enfileira o item e aguarda o resultado do lote em que ele for despachado"""
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._fila.append((item, futuro, time.perf_counter()))
+
+        if len(self._fila) >= self.max_lote:
+            self._despachar()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.janela, self._despachar)
+
+        return await futuro
+
+    def _despachar(self):
+        """Retira até `max_lote` itens da fila e inicia sua execução"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        lote, self._fila = self._fila[:self.max_lote], self._fila[self.max_lote:]
+        if lote:
+            tarefa = asyncio.get_running_loop().create_task(self._executar(lote))
+            # Mantém referência até o fim para a tarefa não ser coletada
+            self._tarefas.add(tarefa)
+            tarefa.add_done_callback(self._tarefas.discard)
+
+        if self._fila:
+            if len(self._fila) >= self.max_lote:
+                self._despachar()
+            else:
+                self._timer = asyncio.get_running_loop().call_later(self.janela, self._despachar)
+
+    async def _executar(self, lote: List[Tuple[Any, asyncio.Future, float]]):
+        agora = time.perf_counter()
+        metrics.observar(f"{self.nome}_tamanho", len(lote))
+        for _, _, entrada in lote:
+            metrics.observar(f"{self.nome}_espera_ms", (agora - entrada) * 1000)
+
+        try:
+            resultados = await self.executar_lote([item for item, _, _ in lote])
+        except Exception as e:
+            for _, futuro, _ in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+
+        for (_, futuro, _), resultado in zip(lote, resultados):
+            # O chamador pode ter sido cancelado (ex.: cliente desconectou)
+            if not futuro.done():
+                futuro.set_result(resultado)
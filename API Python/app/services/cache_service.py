@@ -0,0 +1,314 @@
+"""
+Caches dos serviços
+- ExtractionCache: extrações do LLM (LRU em memória + tabela cache_extracoes)
+- TranscriptionCache: transcrições do Whisper, endereçadas pelo hash do áudio (disco)
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from sqlalchemy import delete, select
+from app.core.metrics import metrics
+from app.database.models import CacheExtracao, SessionLocal
+
+
+class ExtractionCache:
+    """Cache de resultados do LLMService, chaveado por texto normalizado + versão"""
+
+    # A cada quantas gravações o tamanho da tabela é verificado
+    INTERVALO_LIMPEZA = 500
+
+    def __init__(self, versao: str, max_memoria: int, max_entradas: int, ttl: int):
+        """
+        Args:
+            versao: Identificador do modelo + prompt; entradas de outras versões são ignoradas
+            max_memoria: Quantidade máxima de entradas no LRU em memória
+            max_entradas: Quantidade máxima de linhas na tabela persistente
+            ttl: Tempo de vida das entradas, em segundos
+        """
+        self.versao = versao
+        self.max_memoria = max_memoria
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._memoria: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._gravacoes = 0
+        self.hits_memoria = 0
+        self.hits_persistente = 0
+        self.misses = 0
+        metrics.registrar_coletor("llm_cache", self.estatisticas)
+
+    @staticmethod
+    def normalizar(texto: str) -> str:
+        """Normaliza o texto para que variações triviais usem a mesma entrada"""
+        texto = unicodedata.normalize("NFC", texto).casefold()
+        texto = re.sub(r"\s+", " ", texto)
+        return texto.strip(" .,!?;:")
+
+    def chave(self, texto: str) -> str:
+        """Chave do cache para o texto na versão atual"""
+        conteudo = f"{self.versao}\0{self.normalizar(texto)}"
+        return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+    def obter(self, texto: str) -> Optional[Dict[str, Any]]:
+        """Busca o resultado em memória e, se não houver, na tabela persistente"""
+        chave = self.chave(texto)
+        resultado = self._obter_memoria(chave)
+        if resultado is None:
+            resultado = self._obter_persistente(chave)
+        self._contabilizar(resultado)
+        return resultado
+
+    async def aobter(self, texto: str) -> Optional[Dict[str, Any]]:
+        """Versão assíncrona de `obter`; só a consulta ao banco vai para uma thread"""
+        chave = self.chave(texto)
+        resultado = self._obter_memoria(chave)
+        if resultado is None:
+            resultado = await asyncio.to_thread(self._obter_persistente, chave)
+        self._contabilizar(resultado)
+        return resultado
+
+    def guardar(self, texto: str, resultado: Dict[str, Any]):
+        """Armazena o resultado em memória e na tabela persistente"""
+        chave = self.chave(texto)
+        self._guardar_memoria(chave, resultado)
+        self._guardar_persistente(chave, resultado)
+
+    async def aguardar(self, texto: str, resultado: Dict[str, Any]):
+        """Versão assíncrona de `guardar`"""
+        chave = self.chave(texto)
+        self._guardar_memoria(chave, resultado)
+        await asyncio.to_thread(self._guardar_persistente, chave, resultado)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Contadores de acerto/erro do cache"""
+        hits = self.hits_memoria + self.hits_persistente
+        total = hits + self.misses
+        return {
+            "hits_memoria": self.hits_memoria,
+            "hits_persistente": self.hits_persistente,
+            "misses": self.misses,
+            "hit_ratio": hits / total if total else 0.0,
+            "entradas_memoria": len(self._memoria),
+        }
+
+    def _contabilizar(self, resultado: Optional[Dict[str, Any]]):
+        if resultado is None:
+            with self._lock:
+                self.misses += 1
+            metrics.incrementar("llm_cache_misses")
+
+    def _obter_memoria(self, chave: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entrada = self._memoria.get(chave)
+            if entrada is None:
+                return None
+            expira_em, resultado = entrada
+            if expira_em < time.monotonic():
+                del self._memoria[chave]
+                return None
+            self._memoria.move_to_end(chave)
+            self.hits_memoria += 1
+        metrics.incrementar("llm_cache_hits_memoria")
+        return dict(resultado)
+
+    def _guardar_memoria(self, chave: str, resultado: Dict[str, Any], ttl: Optional[float] = None):
+        expira_em = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._memoria[chave] = (expira_em, dict(resultado))
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.max_memoria:
+                self._memoria.popitem(last=False)
+
+    def _obter_persistente(self, chave: str) -> Optional[Dict[str, Any]]:
+        try:
+            with SessionLocal() as db:
+                entrada = db.get(CacheExtracao, chave)
+                if entrada is None:
+                    return None
+
+                agora = datetime.utcnow()
+                if entrada.criado_em < agora - timedelta(seconds=self.ttl):
+                    db.delete(entrada)
+                    db.commit()
+                    return None
+
+                entrada.acessado_em = agora
+                resultado = json.loads(entrada.resultado)
+                restante = (entrada.criado_em - agora).total_seconds() + self.ttl
+                db.commit()
+        except Exception as e:
+            # Falhas no cache nunca devem impedir o processamento
+            print(f"Erro ao consultar cache de extrações: {e}")
+            return None
+
+        self._guardar_memoria(chave, resultado, ttl=restante)
+        with self._lock:
+            self.hits_persistente += 1
+        metrics.incrementar("llm_cache_hits_persistente")
+        return resultado
+
+    def _guardar_persistente(self, chave: str, resultado: Dict[str, Any]):
+        try:
+            with SessionLocal() as db:
+                agora = datetime.utcnow()
+                db.merge(CacheExtracao(
+                    chave=chave,
+                    versao=self.versao,
+                    resultado=json.dumps(resultado, ensure_ascii=False),
+                    criado_em=agora,
+                    acessado_em=agora
+                ))
+                db.commit()
+
+                with self._lock:
+                    self._gravacoes += 1
+                    limpar = self._gravacoes % self.INTERVALO_LIMPEZA == 0
+                if limpar:
+                    self._aplicar_limites(db)
+        except Exception as e:
+            print(f"Erro ao gravar cache de extrações: {e}")
+
+    def _aplicar_limites(self, db):
+        """
+        Remove entradas expiradas e as menos acessadas além de `max_entradas`
+
+        Vale para todas as versões: entradas de outro modelo/prompt não são
+        apagadas de imediato (outro processo pode estar usando essa versão,
+        ex.: durante um deploy) e saem por aqui quando deixam de ser acessadas.
+        """
+        limite_ttl = datetime.utcnow() - timedelta(seconds=self.ttl)
+        db.execute(delete(CacheExtracao).where(CacheExtracao.criado_em < limite_ttl))
+
+        corte = db.execute(
+            select(CacheExtracao.acessado_em)
+            .order_by(CacheExtracao.acessado_em.desc())
+            .offset(self.max_entradas)
+            .limit(1)
+        ).scalar()
+        if corte is not None:
+            db.execute(delete(CacheExtracao).where(CacheExtracao.acessado_em <= corte))
+        db.commit()
+
+
+class TranscriptionCache:
+    """Cache em disco de transcrições, chaveado pelo hash do áudio + modelo + idioma"""
+
+    def __init__(self, diretorio: str, max_bytes: int, modelo: str, idioma: str):
+        """
+        Args:
+            diretorio: Pasta onde as transcrições são gravadas (um arquivo por áudio)
+            max_bytes: Tamanho máximo da pasta; os arquivos menos usados são removidos
+            modelo: Modelo do Whisper (faz parte da chave)
+            idioma: Idioma da transcrição (faz parte da chave)
+        """
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self.prefixo = f"{modelo}\0{idioma}\0"
+        self._lock = threading.Lock()
+        self._tamanho_total: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.diretorio, exist_ok=True)
+        metrics.registrar_coletor("transcricao_cache", self.estatisticas)
+
+    def chave(self, hash_audio: str) -> str:
+        """Chave do cache para o sha256 (hex) do conteúdo do áudio"""
+        return hashlib.sha256((self.prefixo + hash_audio).encode("utf-8")).hexdigest()
+
+    def obter(self, chave: str) -> Optional[str]:
+        """Retorna o texto transcrito, se existir, marcando-o como usado recentemente"""
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, "r", encoding="utf-8") as arquivo:
+                texto = json.load(arquivo)["text"]
+            os.utime(caminho)  # mtime é a referência do LRU
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            metrics.incrementar("transcricao_cache_misses")
+            return None
+
+        with self._lock:
+            self.hits += 1
+        metrics.incrementar("transcricao_cache_hits")
+        return texto
+
+    async def aobter(self, chave: str) -> Optional[str]:
+        """Versão assíncrona de `obter`"""
+        return await asyncio.to_thread(self.obter, chave)
+
+    def guardar(self, chave: str, texto: str):
+        """Grava a transcrição e remove as mais antigas se o limite for excedido"""
+        caminho = self._caminho(chave)
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        try:
+            conteudo = json.dumps({"text": texto}, ensure_ascii=False).encode("utf-8")
+            with open(temporario, "wb") as arquivo:
+                arquivo.write(conteudo)
+            # Ao sobrescrever uma chave, o arquivo anterior deixa de ocupar espaço
+            try:
+                anterior = os.stat(caminho).st_size
+            except FileNotFoundError:
+                anterior = 0
+            os.replace(temporario, caminho)
+
+            with self._lock:
+                if self._tamanho_total is None:
+                    self._tamanho_total = self._medir()
+                else:
+                    self._tamanho_total += len(conteudo) - anterior
+                excedeu = self._tamanho_total > self.max_bytes
+            if excedeu:
+                self._evictar()
+        except OSError as e:
+            print(f"Erro ao gravar cache de transcrições: {e}")
+
+    async def aguardar(self, chave: str, texto: str):
+        """Versão assíncrona de `guardar`"""
+        await asyncio.to_thread(self.guardar, chave, texto)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Contadores de acerto/erro do cache"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "bytes": self._tamanho_total,
+        }
+
+    def _caminho(self, chave: str) -> str:
+        return os.path.join(self.diretorio, f"{chave}.json")
+
+    def _arquivos(self):
+        with os.scandir(self.diretorio) as entradas:
+            return [e for e in entradas if e.is_file() and e.name.endswith(".json")]
+
+    def _medir(self) -> int:
+        return sum(e.stat().st_size for e in self._arquivos())
+
+    def _evictar(self):
+        """Remove os arquivos menos usados até ficar em 90% do limite"""
+        entradas = sorted(
+            ((e.stat().st_mtime, e.stat().st_size, e.path) for e in self._arquivos())
+        )
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        alvo = self.max_bytes * 0.9
+        for _, tamanho, caminho in entradas:
+            if total <= alvo:
+                break
+            try:
+                os.remove(caminho)
+                total -= tamanho
+            except OSError:
+                pass
+        with self._lock:
+            self._tamanho_total = total
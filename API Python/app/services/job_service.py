@@ -0,0 +1,419 @@
+"""
+Serviço de processamento de áudio em segundo plano
+
+O áudio é gravado em disco e o job registrado na tabela `jobs_audio` antes da
+resposta 202; um conjunto fixo de trabalhadores consome a fila. Na
+inicialização, jobs pendentes voltam para a fila, então um restart não perde
+áudios já aceitos. Um job em processamento renova `atualizado_em` enquanto
+roda; só quando essa renovação para por mais de `JOBS_LEASE_S` (processo
+encerrado no meio) ele é retomado, por qualquer processo da API. Da mesma
+forma, um job pendente parado há mais que o lease (estava na fila em memória
+de um processo que caiu) entra na fila dos processos ainda ativos.
+"""
+import asyncio
+import ipaddress
+import json
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+import httpx
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.core.metrics import metrics
+from app.database.models import JobAudio, SessionLocal
+
+STATUS_FINAIS = ("concluido", "erro")
+
+
+async def validar_callback_url(url: str) -> Optional[str]:
+    """
+    Verifica se a callback_url pode receber o POST do job
+
+    Com `JOBS_CALLBACK_HOSTS`, só os hosts listados são aceitos. Sem ela, o
+    host é resolvido e todos os endereços precisam ser públicos: loopback,
+    redes privadas, link-local (metadados da nuvem) etc. são recusados, para
+    a API não ser usada para alcançar serviços internos.
+
+    Returns:
+        None se a URL é aceita, senão o motivo da recusa
+    """
+    partes = urlsplit(url)
+    if partes.scheme not in ("http", "https") or not partes.hostname:
+        return "callback_url deve ser uma URL http(s)"
+
+    host = partes.hostname.lower()
+    permitidos = [h.strip().lower() for h in settings.JOBS_CALLBACK_HOSTS.split(",") if h.strip()]
+    if permitidos:
+        return None if host in permitidos else "host da callback_url não permitido"
+
+    try:
+        enderecos = await asyncio.get_running_loop().getaddrinfo(
+            host, partes.port or (443 if partes.scheme == "https" else 80),
+            type=socket.SOCK_STREAM
+        )
+    except (socket.gaierror, ValueError):
+        return "host da callback_url não encontrado"
+
+    for *_, endereco in enderecos:
+        ip = ipaddress.ip_address(endereco[0].split("%")[0])
+        if not ip.is_global or ip.is_multicast:
+            return "callback_url não pode apontar para endereços internos"
+    return None
+
+
+def concluir_job(db: Session, job_id: str) -> bool:
+    """
+    Marca o job como concluído, sem fazer commit
+
+    Deve ser o primeiro comando da transação que grava o gasto: retorna False
+    se o job não está mais em processamento (finalizado por outra tentativa),
+    e aí nada deve ser gravado. Se o processo cair antes do commit, o job
+    volta para a fila e o gasto não é duplicado.
+    """
+    return db.execute(
+        update(JobAudio)
+        .where(JobAudio.id == job_id, JobAudio.status == "processando")
+        .values(status="concluido", erro=None, atualizado_em=datetime.utcnow())
+    ).rowcount == 1
+
+
+def guardar_resultado_job(db: Session, job_id: str, resultado: Dict[str, Any]):
+    """Grava o resultado de um job concluído com `concluir_job`, sem fazer commit"""
+    db.execute(
+        update(JobAudio)
+        .where(JobAudio.id == job_id)
+        .values(resultado=json.dumps(resultado, default=str))
+    )
+
+
+class JobService:
+    """Fila persistente de áudios com um número limitado de trabalhadores"""
+
+    def __init__(
+        self,
+        processar: Callable[[JobAudio], Awaitable[Dict[str, Any]]],
+        diretorio: str,
+        trabalhadores: int,
+        max_fila: int,
+        max_tentativas: int,
+        lease_s: float
+    ):
+        """
+        Args:
+            processar: Processa o job e retorna o ProcessamentoResponse (dict);
+                pode concluir o job na própria transação com `concluir_job`
+                e `guardar_resultado_job`
+            diretorio: Onde os áudios ficam até o job terminar
+            trabalhadores: Jobs processados ao mesmo tempo
+            max_fila: Jobs aguardando acima dos quais novos envios são recusados
+            max_tentativas: Falhas (exceções) aceitas antes de marcar o job como erro
+            lease_s: Tempo sem renovação após o qual um job em processamento é retomado
+        """
+        self.processar = processar
+        self.diretorio = diretorio
+        self.trabalhadores = trabalhadores
+        self.max_fila = max_fila
+        self.max_tentativas = max_tentativas
+        self.lease_s = lease_s
+        self.chunk_size = settings.WHISPER_CHUNK_SIZE
+        self._fila: Optional[asyncio.Queue] = None
+        self._tarefas: List[asyncio.Task] = []
+        self._client: Optional[httpx.AsyncClient] = None
+
+        metrics.registrar_coletor("jobs_audio", lambda: {
+            "fila": self._fila.qsize() if self._fila is not None else 0,
+            "trabalhadores": len(self._tarefas)
+        })
+
+    async def iniciar(self):
+        """Recupera os jobs não finalizados e inicia os trabalhadores"""
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._fila = asyncio.Queue()
+
+        for job_id in await asyncio.to_thread(self._recuperar):
+            self._fila.put_nowait(job_id)
+
+        self._tarefas = [
+            asyncio.create_task(self._trabalhador())
+            for _ in range(self.trabalhadores)
+        ]
+        self._tarefas.append(asyncio.create_task(self._vigiar()))
+
+    async def encerrar(self):
+        """Para os trabalhadores; jobs em andamento são retomados quando o lease expirar"""
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self._tarefas = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def criar(self, arquivo: UploadFile, filename: str, content_type: str, callback_url: Optional[str] = None) -> JobAudio:
+        """
+        Grava o áudio em disco, registra o job e o coloca na fila
+
+        Raises:
+            HTTPException: 503 se a fila estiver cheia
+        """
+        if self._fila is None:
+            raise HTTPException(status_code=503, detail="Fila de jobs não iniciada")
+        if self._fila.qsize() >= self.max_fila:
+            metrics.incrementar("jobs_recusados")
+            raise HTTPException(
+                status_code=503,
+                detail="Fila de processamento cheia, tente novamente em instantes",
+                headers={"Retry-After": "30"}
+            )
+
+        job_id = uuid.uuid4().hex
+        caminho = os.path.join(self.diretorio, job_id)
+        try:
+            with open(caminho, "wb") as destino:
+                while True:
+                    bloco = await arquivo.read(self.chunk_size)
+                    if not bloco:
+                        break
+                    await asyncio.to_thread(destino.write, bloco)
+
+            job = JobAudio(
+                id=job_id,
+                status="pendente",
+                arquivo=caminho,
+                filename=filename,
+                content_type=content_type,
+                callback_url=callback_url,
+                tentativas=0
+            )
+            await asyncio.to_thread(self._inserir, job)
+        except Exception:
+            self._remover_arquivo(caminho)
+            raise
+
+        self._fila.put_nowait(job_id)
+        metrics.incrementar("jobs_criados")
+        return job
+
+    async def obter(self, job_id: str) -> Optional[JobAudio]:
+        """Job pelo id, ou None"""
+        return await asyncio.to_thread(self._obter, job_id)
+
+    async def _trabalhador(self):
+        while True:
+            job_id = await self._fila.get()
+            try:
+                await self._executar(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Erro inesperado no job {job_id}: {e}")
+            finally:
+                self._fila.task_done()
+
+    async def _vigiar(self):
+        """Coloca na fila, periodicamente, jobs abandonados por outro processo (ou por este)"""
+        while True:
+            await asyncio.sleep(self.lease_s)
+            try:
+                for job_id in await asyncio.to_thread(self._retomar_expirados):
+                    print(f"Job {job_id} parado há mais de {self.lease_s:.0f}s; retomado")
+                    self._fila.put_nowait(job_id)
+            except Exception as e:
+                print(f"Erro ao retomar jobs expirados: {e}")
+
+    async def _renovar(self, job_id: str):
+        """Mantém o job como ativo (atualizado_em) enquanto ele é processado"""
+        while True:
+            await asyncio.sleep(self.lease_s / 3)
+            await asyncio.to_thread(self._atualizar, job_id)
+
+    async def _processar_renovando(self, job: JobAudio) -> Dict[str, Any]:
+        """Executa `processar` renovando o lease do job até terminar"""
+        renovacao = asyncio.create_task(self._renovar(job.id))
+        try:
+            return await self.processar(job)
+        finally:
+            renovacao.cancel()
+
+    async def _executar(self, job_id: str):
+        job = await asyncio.to_thread(self._reservar, job_id)
+        if job is None:
+            # Já finalizado ou reservado por outro processo
+            return
+
+        metrics.observar("jobs_espera_ms", (datetime.utcnow() - job.criado_em).total_seconds() * 1000)
+        inicio = time.perf_counter()
+        try:
+            resultado = await self._processar_renovando(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            erro = getattr(e, "detail", None) or str(e)
+            print(f"Erro ao processar job {job_id} (tentativa {job.tentativas}): {erro}")
+            if job.tentativas < self.max_tentativas:
+                await asyncio.to_thread(self._atualizar, job_id, status="pendente", erro=erro)
+                # Espera crescente antes de tentar de novo (2s, 4s, ...)
+                asyncio.get_running_loop().call_later(2 ** job.tentativas, self._fila.put_nowait, job_id)
+                return
+            await asyncio.to_thread(self._atualizar, job_id, status="erro", erro=erro)
+            metrics.incrementar("jobs_erros")
+        else:
+            # No-op se `processar` já concluiu o job junto com o gasto
+            await asyncio.to_thread(
+                self._atualizar,
+                job_id,
+                status="concluido",
+                resultado=json.dumps(resultado, default=str)
+            )
+            metrics.incrementar("jobs_concluidos")
+
+        metrics.observar("jobs_duracao_ms", (time.perf_counter() - inicio) * 1000)
+        self._remover_arquivo(job.arquivo)
+        if job.callback_url:
+            await self._notificar(job_id, job.callback_url)
+
+    async def _notificar(self, job_id: str, url: str):
+        """Envia o job finalizado para a callback_url (uma tentativa, erros só são registrados)"""
+        job = await self.obter(job_id)
+        if job is None:
+            return
+        # De novo no envio: o DNS pode ter mudado desde a criação do job
+        motivo = await validar_callback_url(url)
+        if motivo:
+            print(f"Callback do job {job_id} não enviada para {url}: {motivo}")
+            metrics.incrementar("jobs_callback_erros")
+            return
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=settings.JOBS_CALLBACK_TIMEOUT)
+        try:
+            response = await self._client.post(
+                url,
+                content=json.dumps(job_para_dict(job), default=str),
+                headers={"Content-Type": "application/json"}
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            print(f"Erro ao notificar job {job_id} em {url}: {e}")
+            metrics.incrementar("jobs_callback_erros")
+
+    def _recuperar(self) -> List[str]:
+        """Devolve à fila os jobs pendentes e os interrompidos, e remove os finalizados antigos"""
+        self._retomar_expirados()
+        limite = datetime.utcnow() - timedelta(hours=settings.JOBS_RETENCAO_HORAS)
+        with SessionLocal() as db:
+            db.execute(
+                delete(JobAudio)
+                .where(JobAudio.status.in_(STATUS_FINAIS), JobAudio.atualizado_em < limite)
+            )
+            db.commit()
+            return list(db.execute(
+                select(JobAudio.id)
+                .where(JobAudio.status == "pendente")
+                .order_by(JobAudio.criado_em)
+            ).scalars())
+
+    def _retomar_expirados(self) -> List[str]:
+        """
+        Retoma os jobs parados há mais que o lease, como pendentes
+
+        - processando sem renovação: o processo que o executava caiu (jobs de
+          um processo ainda ativo são renovados a cada `lease_s / 3`);
+        - pendente sem mudança: estava na fila em memória de um processo que
+          caiu, e nenhum outro o colocaria na fila até um restart.
+
+        `atualizado_em` é renovado ao retomar, então só um processo fica com
+        cada job, e o mesmo job não volta antes de outro lease.
+
+        Returns:
+            Ids dos jobs retomados por este processo
+        """
+        expirado = datetime.utcnow() - timedelta(seconds=self.lease_s)
+        with SessionLocal() as db:
+            parados = db.execute(
+                select(JobAudio.id, JobAudio.status)
+                .where(JobAudio.status.in_(("processando", "pendente")), JobAudio.atualizado_em < expirado)
+                .order_by(JobAudio.criado_em)
+            ).all()
+            retomados = [
+                job_id for job_id, status in parados
+                # Mesmo filtro no UPDATE: o job pode ter sido renovado, reservado ou
+                # retomado por outro processo nesse meio-tempo
+                if db.execute(
+                    update(JobAudio)
+                    .where(
+                        JobAudio.id == job_id,
+                        JobAudio.status == status,
+                        JobAudio.atualizado_em < expirado
+                    )
+                    .values(status="pendente", atualizado_em=datetime.utcnow())
+                ).rowcount
+            ]
+            db.commit()
+            return retomados
+
+    def _inserir(self, job: JobAudio):
+        with SessionLocal(expire_on_commit=False) as db:
+            db.add(job)
+            db.commit()
+
+    def _obter(self, job_id: str) -> Optional[JobAudio]:
+        with SessionLocal() as db:
+            job = db.get(JobAudio, job_id)
+            if job is not None:
+                db.expunge(job)
+            return job
+
+    def _reservar(self, job_id: str) -> Optional[JobAudio]:
+        """Passa o job de pendente para processando; None se outro trabalhador já o pegou"""
+        with SessionLocal() as db:
+            reservado = db.execute(
+                update(JobAudio)
+                .where(JobAudio.id == job_id, JobAudio.status == "pendente")
+                .values(
+                    status="processando",
+                    tentativas=JobAudio.tentativas + 1,
+                    atualizado_em=datetime.utcnow()
+                )
+            ).rowcount
+            db.commit()
+            if not reservado:
+                return None
+            job = db.get(JobAudio, job_id)
+            db.expunge(job)
+            return job
+
+    def _atualizar(self, job_id: str, **valores):
+        """Atualiza um job ainda em processamento"""
+        with SessionLocal() as db:
+            db.execute(
+                update(JobAudio)
+                .where(JobAudio.id == job_id, JobAudio.status == "processando")
+                .values(atualizado_em=datetime.utcnow(), **valores)
+            )
+            db.commit()
+
+    @staticmethod
+    def _remover_arquivo(caminho: str):
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+
+
+def job_para_dict(job: JobAudio) -> Dict[str, Any]:
+    """Dicionário no formato de JobResponse"""
+    return {
+        "id": job.id,
+        "status": job.status,
+        "tentativas": job.tentativas,
+        "erro": job.erro,
+        "resultado": json.loads(job.resultado) if job.resultado else None,
+        "criado_em": job.criado_em,
+        "atualizado_em": job.atualizado_em
+    }
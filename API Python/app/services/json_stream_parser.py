@@ -0,0 +1,122 @@
+"""
+Leitura incremental do JSON gerado pelo LLM em streaming
+Permite encerrar a geração assim que o objeto de resposta fecha
+"""
+import json
+from typing import Any, Dict, Optional
+
+
+class JSONStreamParser:
+    """
+    Acompanha os trechos recebidos do LLM até o primeiro objeto JSON completo
+
+    Texto antes do objeto (cercas de markdown, "Aqui está o JSON:") é ignorado
+    e o que vier depois dele nem precisa ser gerado. Chaves dentro de strings
+    não contam. Se a primeira chave do objeto for "erro", o resultado é
+    conhecido assim que o valor dela termina, sem esperar o fechamento.
+    """
+
+    def __init__(self):
+        self.texto = ""  # Tudo o que foi recebido
+        self.objeto: Optional[Dict[str, Any]] = None
+        self.erro: Optional[str] = None
+
+        self._posicao = 0  # Próximo caractere de `texto` a examinar
+        self._inicio = -1  # Posição do "{" do objeto atual
+        self._profundidade = 0
+        self._em_string = False
+        self._escape = False
+        self._inicio_string = -1
+        self._esperando_chave = False  # Nível 1: a próxima string é uma chave
+        self._chave: Optional[str] = None  # Última chave de nível 1
+        self._primeira_chave: Optional[str] = None
+
+    @property
+    def concluido(self) -> bool:
+        return self.objeto is not None or self.erro is not None
+
+    def alimentar(self, trecho: str) -> bool:
+        """Acrescenta um trecho da resposta; retorna True quando o resultado já é conhecido"""
+        if self.concluido:
+            return True
+        self.texto += trecho
+
+        texto = self.texto
+        while self._posicao < len(texto):
+            caractere = texto[self._posicao]
+            self._posicao += 1
+
+            if self._inicio < 0:
+                if caractere == "{":
+                    self._abrir_objeto()
+                continue
+
+            if self._em_string:
+                if self._escape:
+                    self._escape = False
+                elif caractere == "\\":
+                    self._escape = True
+                elif caractere == '"':
+                    self._em_string = False
+                    if self._profundidade == 1 and self._fechar_string_nivel_1():
+                        return True
+                continue
+
+            if caractere == '"':
+                self._em_string = True
+                self._inicio_string = self._posicao - 1
+            elif caractere in "{[":
+                self._profundidade += 1
+            elif caractere in "}]":
+                self._profundidade -= 1
+                if self._profundidade == 0 and self._fechar_objeto():
+                    return True
+            elif caractere == "," and self._profundidade == 1:
+                self._esperando_chave = True
+                self._chave = None
+
+        return False
+
+    def _abrir_objeto(self):
+        self._inicio = self._posicao - 1
+        self._profundidade = 1
+        self._esperando_chave = True
+        self._chave = None
+        self._primeira_chave = None
+
+    def _fechar_string_nivel_1(self) -> bool:
+        """Trata o fim de uma chave ou valor string de nível 1; True se o erro foi identificado"""
+        try:
+            valor = json.loads(self.texto[self._inicio_string:self._posicao])
+        except ValueError:
+            return False
+
+        if self._esperando_chave:
+            self._esperando_chave = False
+            self._chave = valor
+            if self._primeira_chave is None:
+                self._primeira_chave = valor
+            return False
+
+        # {"erro": "..."}: o restante do objeto não muda o resultado
+        if self._chave == "erro" and self._primeira_chave == "erro":
+            self.erro = valor
+            return True
+        return False
+
+    def _fechar_objeto(self) -> bool:
+        """Interpreta o objeto que acabou de fechar; se não for JSON válido, procura o próximo"""
+        try:
+            objeto = json.loads(self.texto[self._inicio:self._posicao])
+        except ValueError:
+            objeto = None
+
+        self._inicio = -1
+        if not isinstance(objeto, dict):
+            return False
+
+        if "erro" in objeto:
+            self.erro = objeto.get("erro") or "nao_e_gasto"
+        else:
+            self.objeto = objeto
+        return True
@@ -0,0 +1,248 @@
+"""
+Roteador entre vários backends de LLM
+Escolhe o backend saudável mais rápido e dispara uma requisição de reserva
+(hedge) quando a primeira demora mais que o p95 do backend
+"""
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.core.metrics import metrics
+
+
+class Backend:
+    """Um backend configurado e suas estatísticas recentes"""
+
+    # Amostras mínimas para usar o p95 como tempo de hedge e para avaliar a saúde
+    MIN_AMOSTRAS = 20
+    MIN_RESULTADOS = 5
+    # A taxa de erro olha só os últimos resultados, para reagir rápido a uma queda
+    JANELA_ERROS = 20
+
+    def __init__(self, nome: str, chain: Any, janela: int):
+        self.nome = nome
+        self.chain = chain
+        self.latencias_ms: deque = deque(maxlen=janela)
+        self.resultados: deque = deque(maxlen=min(janela, self.JANELA_ERROS))  # True = sucesso
+        # Mesmos resultados para o /metrics: não é limpo na pausa, senão um backend
+        # pausado por só falhar apareceria com taxa de erro 0
+        self.historico: deque = deque(maxlen=min(janela, self.JANELA_ERROS))
+        self.pausado_ate = 0.0
+        self.pedidos = 0
+        self.falhas_seguidas = 0  # Não é limpo na pausa, ao contrário de `resultados`
+
+    def percentil(self, p: float) -> Optional[float]:
+        if not self.latencias_ms:
+            return None
+        ordenadas = sorted(self.latencias_ms)
+        return ordenadas[int(p * (len(ordenadas) - 1))]
+
+    @property
+    def taxa_erro(self) -> float:
+        """Taxa de erro desde a última pausa (decide uma nova pausa)"""
+        return self._taxa(self.resultados)
+
+    @staticmethod
+    def _taxa(resultados: deque) -> float:
+        if not resultados:
+            return 0.0
+        return 1 - sum(resultados) / len(resultados)
+
+    def saudavel(self, agora: float) -> bool:
+        return agora >= self.pausado_ate
+
+    def chave_ordem(self) -> tuple:
+        """
+        Chave de ordenação entre os saudáveis: menor latência mediana primeiro
+
+        Sem latência medida, o backend vem primeiro se ainda não foi tentado
+        e por último se só falhou até agora (não volta à frente ao sair da
+        pausa; é testado de novo na troca ou no hedge).
+        """
+        p50 = self.percentil(0.50)
+        if p50 is None:
+            return (1, 0.0) if self.falhas_seguidas else (0, 0.0)
+        return (0, p50)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        agora = time.monotonic()
+        pausado_ate = None
+        if not self.saudavel(agora):
+            # `pausado_ate` é do relógio monotônico; no /metrics vai em UTC
+            pausado_ate = datetime.utcfromtimestamp(time.time() + self.pausado_ate - agora).isoformat()
+        return {
+            "p50_ms": self.percentil(0.50),
+            "p95_ms": self.percentil(0.95),
+            "taxa_erro": self._taxa(self.historico),
+            "saudavel": self.saudavel(agora),
+            "pedidos": self.pedidos,
+            "falhas_seguidas": self.falhas_seguidas,
+            "pausado_ate": pausado_ate
+        }
+
+
+class LLMRouter:
+    """
+    Distribui as chamadas ao LLM entre os backends configurados
+
+    Cada chamada vai para o backend saudável com menor latência mediana
+    (backends ainda não tentados vêm primeiro, na ordem da configuração;
+    os que só falharam, por último).
+    Se ele não responder dentro do seu p95, a mesma chamada é enviada ao
+    próximo backend e vale a primeira resposta válida; a outra é cancelada.
+    Erros também passam a chamada para o próximo backend. Um backend com
+    taxa de erro acima de `max_taxa_erro` fica fora da escolha por
+    `pausa_s` segundos.
+    """
+
+    def __init__(
+        self,
+        backends: Dict[str, Any],
+        janela: int,
+        max_taxa_erro: float,
+        pausa_s: float,
+        hedge: bool,
+        hedge_min_ms: float,
+        hedge_padrao_ms: float
+    ):
+        """
+        Args:
+            backends: Nome -> chain (prompt | conector), na ordem de preferência
+            janela: Latências e resultados guardados por backend
+            max_taxa_erro: Taxa de erro a partir da qual o backend é pausado
+            pausa_s: Tempo fora da escolha após ser pausado
+            hedge: Habilita a requisição de reserva
+            hedge_min_ms: Espera mínima antes do hedge
+            hedge_padrao_ms: Espera antes do hedge enquanto o backend não tem histórico
+        """
+        self.backends = [Backend(nome, chain, janela) for nome, chain in backends.items()]
+        self.max_taxa_erro = max_taxa_erro
+        self.pausa_s = pausa_s
+        self.hedge = hedge
+        self.hedge_min_ms = hedge_min_ms
+        self.hedge_padrao_ms = hedge_padrao_ms
+
+        metrics.registrar_coletor("llm_backends", lambda: {
+            backend.nome: backend.estatisticas() for backend in self.backends
+        })
+
+    def ordenar(self) -> List[Backend]:
+        """Backends na ordem de tentativa: saudáveis por latência, depois os pausados"""
+        agora = time.monotonic()
+        saudaveis = [b for b in self.backends if b.saudavel(agora)]
+        pausados = sorted(
+            (b for b in self.backends if not b.saudavel(agora)),
+            key=lambda b: b.pausado_ate
+        )
+        # sort é estável: empates ficam na ordem configurada
+        saudaveis.sort(key=Backend.chave_ordem)
+        return saudaveis + pausados
+
+    async def executar(
+        self,
+        chamar: Callable[[Any], Awaitable[Dict[str, Any]]],
+        valido: Callable[[Dict[str, Any]], bool]
+    ) -> Dict[str, Any]:
+        """
+        Executa `chamar(chain)` no melhor backend, com hedge e troca em caso de erro
+
+        Args:
+            chamar: Recebe a chain do backend e retorna o resultado
+            valido: Diz se o resultado encerra a chamada; inválidos contam como erro
+
+        Returns:
+            A primeira resposta válida; sem nenhuma, a última resposta recebida
+
+        Raises:
+            Exception: A última exceção, se nenhum backend respondeu
+        """
+        fila = self.ordenar()
+        em_andamento: Dict[asyncio.Task, tuple] = {}
+        ultimo_resultado: Optional[Dict[str, Any]] = None
+        ultimo_erro: Optional[BaseException] = None
+
+        def iniciar(backend: Backend):
+            backend.pedidos += 1
+            tarefa = asyncio.create_task(chamar(backend.chain))
+            em_andamento[tarefa] = (backend, time.perf_counter())
+
+        primeiro = fila.pop(0)
+        iniciar(primeiro)
+        houve_hedge = False
+        try:
+            while em_andamento:
+                espera = None
+                if self.hedge and fila and len(em_andamento) == 1:
+                    backend, inicio = next(iter(em_andamento.values()))
+                    espera = max(0.0, self._tempo_hedge(backend) / 1000 - (time.perf_counter() - inicio))
+
+                prontas, _ = await asyncio.wait(
+                    em_andamento,
+                    timeout=espera,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not prontas:
+                    # O backend passou do seu p95: dispara a reserva
+                    metrics.incrementar("llm_hedge_disparos")
+                    houve_hedge = True
+                    iniciar(fila.pop(0))
+                    continue
+
+                for tarefa in prontas:
+                    backend, inicio = em_andamento.pop(tarefa)
+                    latencia_ms = (time.perf_counter() - inicio) * 1000
+                    try:
+                        resultado = tarefa.result()
+                    except Exception as e:
+                        ultimo_erro = e
+                        self._registrar(backend, latencia_ms, sucesso=False)
+                        continue
+
+                    ultimo_resultado = resultado
+                    if valido(resultado):
+                        self._registrar(backend, latencia_ms, sucesso=True)
+                        if houve_hedge and backend is not primeiro:
+                            metrics.incrementar("llm_hedge_vitorias")
+                        return resultado
+                    self._registrar(backend, latencia_ms, sucesso=False)
+
+                # Todos os que estavam em andamento falharam: tenta o próximo
+                if not em_andamento and fila:
+                    iniciar(fila.pop(0))
+        finally:
+            # Chamadas perdedoras: o tempo até o cancelamento entra como latência,
+            # senão um backend lento nunca perderia a posição de mais rápido
+            for tarefa, (backend, inicio) in em_andamento.items():
+                tarefa.cancel()
+                backend.latencias_ms.append((time.perf_counter() - inicio) * 1000)
+            if em_andamento:
+                await asyncio.gather(*em_andamento, return_exceptions=True)
+
+        if ultimo_resultado is not None:
+            return ultimo_resultado
+        raise ultimo_erro
+
+    def _tempo_hedge(self, backend: Backend) -> float:
+        """Quanto esperar (ms) pelo backend antes de disparar a reserva"""
+        if len(backend.latencias_ms) < Backend.MIN_AMOSTRAS:
+            return self.hedge_padrao_ms
+        return max(self.hedge_min_ms, backend.percentil(0.95))
+
+    def _registrar(self, backend: Backend, latencia_ms: float, sucesso: bool):
+        backend.resultados.append(sucesso)
+        backend.historico.append(sucesso)
+        if sucesso:
+            backend.falhas_seguidas = 0
+            backend.latencias_ms.append(latencia_ms)
+            metrics.observar(f"llm_{backend.nome}_latencia_ms", latencia_ms)
+            return
+
+        backend.falhas_seguidas += 1
+        metrics.incrementar(f"llm_{backend.nome}_erros")
+        if len(backend.resultados) >= Backend.MIN_RESULTADOS and backend.taxa_erro >= self.max_taxa_erro:
+            print(f"Backend LLM '{backend.nome}' com taxa de erro {backend.taxa_erro:.0%}; pausado por {self.pausa_s:.0f}s")
+            backend.pausado_ate = time.monotonic() + self.pausa_s
+            # Volta da pausa com histórico limpo (uma nova chance)
+            backend.resultados.clear()
@@ -2,42 +2,102 @@
 Serviço de processamento de texto usando LLM
 Suporta modo local (vLLM) e APIs originais (OpenAI, etc.)
 """
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator, Iterator, List
+import asyncio
+import hashlib
 import json
 import re
+import textwrap
+import time
+from openai import AsyncOpenAI, OpenAI
 from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.messages import SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
 from app.config import settings
+from app.core.metrics import metrics
 from app.models.schemas import GastoFinanceiro
+from app.services.batch_scheduler import MicroBatchScheduler
+from app.services.cache_service import ExtractionCache
+from app.services.json_stream_parser import JSONStreamParser
+from app.services.llm_router import LLMRouter
+from app.services.rule_parser_service import RuleParser
+from app.services.vllm_batch_service import VLLMBatchClient
+
+
+def _gemini_suporta_schema() -> bool:
+    """google-generativeai >= 0.5 aceita response_mime_type/response_schema"""
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        return False
+    campos = getattr(genai.types.GenerationConfig, "__dataclass_fields__", {})
+    return "response_schema" in campos
 
 
 class LLMService:
     """Serviço para processar texto e extrair dados financeiros usando LLM"""
     
     def __init__(self):
-        self.mode = settings.LLM_MODE
-        self.llm = self._get_llm_connector()
+        # O primeiro backend é o principal (chamadas síncronas e versão do cache)
+        self.backends = [modo.strip() for modo in settings.LLM_BACKENDS.split(",") if modo.strip()] or [settings.LLM_MODE]
+        self.mode = self.backends[0]
+        self.llm = self._get_llm_connector(self.mode)
         self.prompt_template = self._create_prompt_template()
+        # Montada uma única vez e reaproveitada em todas as chamadas
+        self.chain = self.prompt_template | self.llm
+        self.roteador = self._create_router()
+        self.cache = self._create_cache() if settings.LLM_CACHE_ENABLED else None
+        self.regras = RuleParser(settings.LLM_FAST_PATH_CONFIANCA) if settings.LLM_FAST_PATH_ENABLED else None
+        # Streaming do vLLM local direto pelo cliente OpenAI, que expõe a resposta HTTP
+        # para ser fechada na parada antecipada (ver `_astream_local`)
+        self.cliente_local: Optional[AsyncOpenAI] = None
+        self.cliente_local_sync: Optional[OpenAI] = None
+        if settings.LLM_STREAMING and "local" in self.backends:
+            self.cliente_local = AsyncOpenAI(api_key=settings.LLM_API_KEY, base_url=settings.LLM_URL)
+            self.cliente_local_sync = OpenAI(api_key=settings.LLM_API_KEY, base_url=settings.LLM_URL)
+        # Micro-lotes: chamadas ao vLLM local agrupadas em uma requisição /v1/completions
+        self.lotes: Optional[VLLMBatchClient] = None
+        self.agendador: Optional[MicroBatchScheduler] = None
+        if settings.LLM_MICROBATCH_JANELA_MS > 0 and "local" in self.backends:
+            self.lotes = VLLMBatchClient(
+                self.prompt_template,
+                self._esquema_resposta() if settings.LLM_GUIDED_DECODING else None
+            )
+            self.agendador = self._create_scheduler()
     
-    def _get_llm_connector(self):
-        """Obtém o conector LLM baseado na configuração"""
-        if self.mode == "local":
+    def _get_llm_connector(self, modo: str):
+        """Obtém o conector LLM do modo informado ("local" ou "gemini")"""
+        if modo == "local":
+            model_kwargs = {}
+            if settings.LLM_GUIDED_DECODING:
+                model_kwargs["extra_body"] = self._extra_body_local()
             return ChatOpenAI(
                 model=settings.LLM_MODEL,
                 openai_api_key=settings.LLM_API_KEY,
                 openai_api_base=settings.LLM_URL,
                 temperature=0,
-                convert_system_message_to_human=True
+                max_tokens=settings.LLM_MAX_TOKENS,
+                model_kwargs=model_kwargs
             )
-        elif self.mode == 'gemini':
+        elif modo == 'gemini':
             # Usando a biblioteca oficial do Google
-            return ChatGoogleGenerativeAI(
+            llm = ChatGoogleGenerativeAI(
                 model="gemini-3-flash-preview",
                 google_api_key=settings.GEMINI_API_KEY,
                 temperature=0,
+                max_output_tokens=settings.LLM_MAX_TOKENS,
                 convert_system_message_to_human=True
             )
+            if settings.LLM_GUIDED_DECODING:
+                if _gemini_suporta_schema():
+                    # Saída estruturada nativa do Gemini
+                    return llm.bind(generation_config={
+                        "response_mime_type": "application/json",
+                        "response_schema": self._esquema_resposta_gemini()
+                    })
+                print("google-generativeai sem suporte a response_schema; usando apenas o prompt")
+            return llm
         else:
             # Para uso futuro com APIs originais (OpenAI, Anthropic, etc.)
             # Exemplo para OpenAI:
@@ -46,27 +106,158 @@ class LLMService:
             #     openai_api_key=settings.LLM_API_KEY,
             #     temperature=0
             # )
-            raise ValueError(f"Modo LLM '{self.mode}' não implementado ainda")
+            raise ValueError(f"Modo LLM '{modo}' não implementado ainda")
     
     def _create_prompt_template(self) -> ChatPromptTemplate:
-        """Cria o template de prompt para extração de dados financeiros"""
-        return ChatPromptTemplate.from_messages([
-            ("system", """
+        """
+        Cria o template de prompt para extração de dados financeiros
+        
+        O prompt de sistema é uma mensagem fixa (não é formatada) e vem antes
+        da entrada: o prefixo enviado é idêntico, byte a byte, em todas as
+        chamadas, e o vLLM (prefix caching) reaproveita o prefill dele.
+        """
+        sistema = textwrap.dedent("""
             Você é um assistente especializado em contabilidade pessoal.
 
             REGRAS DE EXTRAÇÃO:
             1. Extraia apenas dados de gastos/despesas.
-            2. Se a entrada for irrelevante, ofensiva ou não for um gasto, responda APENAS com: {{"erro": "nao_e_gasto"}}
-            3. Se for um gasto, responda APENAS com um JSON válido no formato: {{"valor": float, "item": string, "categoria": string, "meio_pagamento": string (opcional)}}
+            2. Se a entrada for irrelevante, ofensiva ou não for um gasto, responda APENAS com: {"erro": "nao_e_gasto"}
+            3. Se for um gasto, responda APENAS com um JSON válido no formato: {"valor": float, "item": string, "categoria": string, "meio_pagamento": string (opcional)}
             4. Não invente categorias. Use apenas: Alimentação, Transporte, Lazer, Saúde, Moradia, Outros, Bebida.
             5. Converta valores escritos por extenso (ex: "vinte reais") para números (20.0).
             6. Se o valor não estiver explícito, use 0.0 e marque como erro.
             7. Identifique o meio de pagamento se mencionado. Use APENAS: Crédito, Débito, Refeição, Pix. Se não identificar ou for diferente, use null.
             8. Responda APENAS com JSON, sem texto adicional.
-            """),
+            """).strip()
+        return ChatPromptTemplate.from_messages([
+            SystemMessage(content=sistema),
             ("user", "{entrada}")
         ])
     
+    def _extra_body_local(self) -> Dict[str, Any]:
+        """vLLM restringe a geração ao schema (guided decoding) via extra_body"""
+        return {"guided_json": self._esquema_resposta()}
+    
+    def _parametros_local(self, texto: str) -> Dict[str, Any]:
+        """Requisição /v1/chat/completions ao vLLM local, a mesma que a chain envia"""
+        parametros = {
+            "model": settings.LLM_MODEL,
+            "messages": [
+                {"role": "system" if mensagem.type == "system" else "user", "content": mensagem.content}
+                for mensagem in self.prompt_template.format_messages(entrada=texto)
+            ],
+            "temperature": 0,
+            "max_tokens": settings.LLM_MAX_TOKENS,
+            "stream": True
+        }
+        if settings.LLM_GUIDED_DECODING:
+            parametros["extra_body"] = self._extra_body_local()
+        return parametros
+    
+    @staticmethod
+    def _esquema_resposta() -> Dict[str, Any]:
+        """
+        JSON schema da resposta: um GastoFinanceiro ou {"erro": "nao_e_gasto"}
+        
+        As categorias e meios de pagamento vêm dos Literal do modelo.
+        """
+        gasto = GastoFinanceiro.model_json_schema()
+        gasto["additionalProperties"] = False
+        erro = {
+            "type": "object",
+            "properties": {"erro": {"type": "string", "enum": ["nao_e_gasto"]}},
+            "required": ["erro"],
+            "additionalProperties": False
+        }
+        return {"anyOf": [gasto, erro]}
+    
+    @staticmethod
+    def _esquema_resposta_gemini() -> Dict[str, Any]:
+        """
+        Mesmo schema no subconjunto OpenAPI aceito pelo Gemini (sem anyOf)
+        
+        Um único objeto com todos os campos opcionais: ou `erro`, ou os dados do gasto.
+        """
+        propriedades = GastoFinanceiro.model_json_schema()["properties"]
+        meio_pagamento = next(
+            opcao for opcao in propriedades["meio_pagamento"]["anyOf"] if "enum" in opcao
+        )
+        return {
+            "type": "object",
+            "properties": {
+                "valor": {"type": "number"},
+                "item": {"type": "string"},
+                "categoria": {"type": "string", "enum": propriedades["categoria"]["enum"]},
+                "meio_pagamento": {"type": "string", "enum": meio_pagamento["enum"], "nullable": True},
+                "erro": {"type": "string", "enum": ["nao_e_gasto"]}
+            }
+        }
+    
+    def _versao(self) -> str:
+        """
+        Identifica o modelo + prompt em uso
+        
+        Qualquer alteração em `_create_prompt_template` ou no modelo gera uma
+        versão nova, invalidando automaticamente o cache de extrações.
+        """
+        # Com saída estruturada (Gemini) o conector vem envolvido em um RunnableBinding
+        llm = getattr(self.llm, "bound", self.llm)
+        modelo = getattr(llm, "model_name", None) or getattr(llm, "model", "")
+        mensagens = self.prompt_template.format_messages(entrada="{entrada}")
+        # O schema da decodificação guiada também muda as respostas
+        esquema = self._esquema_resposta() if settings.LLM_GUIDED_DECODING else None
+        identificacao = [self.mode, modelo, [(m.type, m.content) for m in mensagens], esquema]
+        if len(self.backends) > 1:
+            # Respostas podem vir de qualquer um dos backends
+            identificacao.append(self.backends[1:])
+        conteudo = json.dumps(identificacao, ensure_ascii=False)
+        return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+    
+    def _create_cache(self) -> ExtractionCache:
+        """Cria o cache de extrações para a versão atual do modelo/prompt"""
+        return ExtractionCache(
+            versao=self._versao(),
+            max_memoria=settings.LLM_CACHE_MAX_MEMORIA,
+            max_entradas=settings.LLM_CACHE_MAX_ENTRADAS,
+            ttl=settings.LLM_CACHE_TTL
+        )
+    
+    def _create_router(self) -> LLMRouter:
+        """Cria o roteador entre os backends configurados (com um só, apenas o repassa)"""
+        self.chains = {self.mode: self.chain}
+        for modo in self.backends[1:]:
+            self.chains[modo] = self.prompt_template | self._get_llm_connector(modo)
+        return LLMRouter(
+            backends=self.chains,
+            janela=settings.LLM_ROUTER_JANELA,
+            max_taxa_erro=settings.LLM_ROUTER_MAX_ERROS,
+            pausa_s=settings.LLM_ROUTER_PAUSA_S,
+            hedge=settings.LLM_HEDGE_ENABLED,
+            hedge_min_ms=settings.LLM_HEDGE_MIN_MS,
+            hedge_padrao_ms=settings.LLM_HEDGE_PADRAO_MS
+        )
+    
+    def _create_scheduler(self) -> MicroBatchScheduler:
+        """Cria o agendador que agrupa chamadas concorrentes ao vLLM em micro-lotes"""
+        return MicroBatchScheduler(
+            executar_lote=self.lotes.gerar,
+            janela_ms=settings.LLM_MICROBATCH_JANELA_MS,
+            max_lote=settings.LLM_MICROBATCH_MAX
+        )
+    
+    async def aclose(self):
+        """Fecha as conexões usadas pelos micro-lotes e pelo streaming local"""
+        if self.lotes is not None:
+            await self.lotes.aclose()
+        if self.cliente_local is not None:
+            await self.cliente_local.close()
+            self.cliente_local_sync.close()
+    
+    @staticmethod
+    def _cacheavel(resultado: Dict[str, Any]) -> bool:
+        """Só resultados determinísticos vão para o cache (não falhas de conexão etc.)"""
+        return "erro" not in resultado or resultado["erro"] == "nao_e_gasto"
+    
     def processar(self, texto: str) -> Dict[str, Any]:
         """
         Processa texto e extrai dados financeiros
@@ -80,59 +271,360 @@ class LLMService:
         if not texto or not texto.strip():
             return {"erro": "texto_vazio"}
         
+        texto = texto.strip()
+        
+        # Caminho rápido: frases simples são resolvidas por regras, sem LLM
+        if self.regras:
+            resultado = self.regras.interpretar(texto)
+            if resultado is not None:
+                return resultado
+        
+        if self.cache:
+            em_cache = self.cache.obter(texto)
+            if em_cache is not None:
+                return em_cache
+        
         try:
-            chain = self.prompt_template | self.llm
+            inicio = time.perf_counter()
+            if settings.LLM_STREAMING:
+                leitor = JSONStreamParser()
+                if self.mode == "local":
+                    stream = self._stream_local(texto)
+                else:
+                    stream = (parte.content for parte in self.chain.stream({"entrada": texto}))
+                try:
+                    for trecho in stream:
+                        if not leitor.texto and trecho:
+                            metrics.observar("llm_ttft_ms", (time.perf_counter() - inicio) * 1000)
+                        if leitor.alimentar(trecho):
+                            metrics.incrementar("llm_parada_antecipada")
+                            break
+                finally:
+                    stream.close()
+                metrics.observar("llm_latencia_ms", (time.perf_counter() - inicio) * 1000)
+                resultado = self._interpretar_leitor(leitor)
+            else:
+                resposta = self.chain.invoke({
+                    "entrada": texto
+                })
+                metrics.observar("llm_latencia_ms", (time.perf_counter() - inicio) * 1000)
+                resultado = self._interpretar_resposta(resposta.content)
             
-            resposta = chain.invoke({
-                "entrada": texto.strip()
-            })
+        except Exception as e:
+            return self._tratar_erro(e)
+        
+        if self.cache and self._cacheavel(resultado):
+            self.cache.guardar(texto, resultado)
+        return resultado
+    
+    async def aprocessar(self, texto: str) -> Dict[str, Any]:
+        """
+        Versão assíncrona de `processar`, usa `ainvoke` para não bloquear o event loop
+        
+        Args:
+            texto: Texto a ser processado
             
-            # Extrai o conteúdo da resposta
-            resposta_texto = resposta.content.strip()
+        Returns:
+            Dicionário com dados extraídos ou erro
+        """
+        if not texto or not texto.strip():
+            return {"erro": "texto_vazio"}
+        
+        texto = texto.strip()
+        
+        resultado = await self._aresolver_sem_llm(texto)
+        if resultado is not None:
+            return resultado
+        
+        try:
+            # Chamadas concorrentes são agrupadas pelo batching contínuo do vLLM
+            resultado = await self._arotear(texto)
             
-            # Remove markdown code blocks se existirem
-            if "```json" in resposta_texto:
-                resposta_texto = resposta_texto.split("```json")[1].split("```")[0].strip()
-            elif "```" in resposta_texto:
-                resposta_texto = resposta_texto.split("```")[1].split("```")[0].strip()
+        except Exception as e:
+            return self._tratar_erro(e)
+        
+        if self.cache and self._cacheavel(resultado):
+            await self.cache.aguardar(texto, resultado)
+        return resultado
+    
+    async def aprocessar_lote(self, textos: List[str]) -> List[Dict[str, Any]]:
+        """
+        Processa vários textos de uma vez
+        
+        Textos resolvidos pelo caminho rápido ou pelo cache não chegam ao LLM;
+        os demais (sem repetição) são enviados em paralelo, limitados a
+        `LLM_BATCH_CONCURRENCY` requisições simultâneas.
+        
+        Args:
+            textos: Textos a serem processados
             
-            # Tenta parsear como JSON
-            try:
-                dados = json.loads(resposta_texto)
-            except json.JSONDecodeError:
-                # Se não for JSON válido, tenta extrair JSON do texto
-                json_match = re.search(r'\{[^}]+\}', resposta_texto)
-                if json_match:
-                    dados = json.loads(json_match.group())
-                else:
-                    return {"erro": "resposta_invalida"}
+        Returns:
+            Um dicionário (dados extraídos ou erro) por texto, na mesma ordem
+        """
+        resultados: List[Optional[Dict[str, Any]]] = [None] * len(textos)
+        pendentes: Dict[str, List[int]] = {}
+        
+        for indice, texto in enumerate(textos):
+            if not texto or not texto.strip():
+                resultados[indice] = {"erro": "texto_vazio"}
+                continue
             
-            # Verifica se há erro na resposta
-            if "erro" in dados:
-                return {"erro": dados.get("erro", "nao_e_gasto")}
+            texto = texto.strip()
+            if texto in pendentes:
+                pendentes[texto].append(indice)
+                continue
             
-            # Valida e cria o objeto Pydantic
-            gasto = GastoFinanceiro(**dados)
+            resultado = await self._aresolver_sem_llm(texto)
+            if resultado is not None:
+                resultados[indice] = resultado
+            else:
+                pendentes[texto] = [indice]
+        
+        if pendentes:
+            entradas = list(pendentes)
+            respostas = await self._aexecutar_lote(entradas)
             
-            return {
-                "valor": gasto.valor,
-                "item": gasto.item,
-                "categoria": gasto.categoria,
-                "meio_pagamento": getattr(gasto, "meio_pagamento", None)
-            }
+            for texto, resultado in zip(entradas, respostas):
+                if isinstance(resultado, Exception):
+                    resultado = self._tratar_erro(resultado)
+                elif self.cache and self._cacheavel(resultado):
+                    await self.cache.aguardar(texto, resultado)
+                
+                for indice in pendentes[texto]:
+                    resultados[indice] = dict(resultado)
+        
+        return resultados
+    
+    async def _aexecutar_lote(self, textos: List[str]) -> List[Any]:
+        """
+        Envia vários textos ao LLM, no máximo `LLM_BATCH_CONCURRENCY` ao mesmo tempo
+        
+        Cada texto passa pelo roteador como uma chamada avulsa (latência e
+        erros registrados, troca de backend e hedge); as requisições
+        simultâneas são agrupadas no servidor pelo batching contínuo do vLLM.
+        
+        Returns:
+            Um resultado (ou a exceção levantada) por texto, na mesma ordem
+        """
+        limite = asyncio.Semaphore(settings.LLM_BATCH_CONCURRENCY)
+        
+        async def processar(texto: str) -> Dict[str, Any]:
+            async with limite:
+                return await self._arotear(texto)
+        
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(
+            *(processar(texto) for texto in textos),
+            return_exceptions=True
+        )
+        metrics.observar("llm_lote_latencia_ms", (time.perf_counter() - inicio) * 1000)
+        metrics.observar("llm_lote_tamanho", len(textos))
+        return resultados
+    
+    async def _arotear(self, texto: str) -> Dict[str, Any]:
+        """Chamada pelo backend mais rápido disponível, com hedge/troca se ele demorar ou falhar"""
+        return await self.roteador.executar(
+            lambda chain: self._ainvocar(texto, chain),
+            valido=lambda resultado: resultado.get("erro") != "resposta_invalida"
+        )
+    
+    async def _ainvocar(self, texto: str, chain: Any) -> Dict[str, Any]:
+        """
+        Uma chamada ao LLM pela `chain` de um backend, já interpretada
+        
+        Dados que não passam na validação viram o dicionário de erro (é a
+        resposta do modelo); falhas de conexão sobem como exceção para o
+        roteador tentar outro backend.
+        """
+        try:
+            if self._em_microlote(chain):
+                resultado = await self._ainvocar_microlote(texto)
+                if resultado is not None:
+                    return resultado
+            if settings.LLM_STREAMING:
+                return await self._ainvocar_stream(texto, chain)
             
+            inicio = time.perf_counter()
+            resposta = await chain.ainvoke({
+                "entrada": texto
+            })
+            metrics.observar("llm_latencia_ms", (time.perf_counter() - inicio) * 1000)
+            return self._interpretar_resposta(resposta.content)
         except ValueError as e:
+            return self._tratar_erro(e)
+    
+    def _em_microlote(self, chain: Any) -> bool:
+        """Chamadas ao backend local vão pelo agendador de micro-lotes, se habilitado"""
+        return (
+            self.agendador is not None
+            and self.lotes.disponivel
+            and chain is self.chains.get("local")
+        )
+    
+    async def _ainvocar_microlote(self, texto: str) -> Optional[Dict[str, Any]]:
+        """
+        Uma chamada ao vLLM agrupada com as concorrentes em uma requisição /v1/completions
+        
+        Sem streaming (a requisição é do lote inteiro): o fim da geração vem do
+        guided decoding, que encerra no fechamento do JSON, e de LLM_MAX_TOKENS.
+        
+        Returns:
+            O resultado, ou None se o servidor não aceita lotes (usar a rota de chat)
+        """
+        inicio = time.perf_counter()
+        conteudo = await self.agendador.submeter(texto)
+        if conteudo is VLLMBatchClient.SEM_LOTE:
+            return None
+        if isinstance(conteudo, Exception):
+            raise conteudo
+        metrics.observar("llm_latencia_ms", (time.perf_counter() - inicio) * 1000)
+        return self._interpretar_resposta(conteudo)
+    
+    async def _ainvocar_stream(self, texto: str, chain: Any) -> Dict[str, Any]:
+        """
+        Chama o LLM em streaming e para de ler assim que o JSON de resposta fecha
+        
+        No vLLM local, fechar o stream encerra a resposta HTTP e o servidor
+        aborta a geração: o texto que os modelos locais costumam acrescentar
+        depois do JSON não é gerado. Nos demais backends só a leitura para.
+        `{"erro": ...}` é reconhecido antes mesmo do fechamento.
+        """
+        leitor = JSONStreamParser()
+        
+        inicio = time.perf_counter()
+        if self.cliente_local is not None and chain is self.chains.get("local"):
+            stream = self._astream_local(texto)
+        else:
+            stream = self._astream_chain(texto, chain)
+        try:
+            async for trecho in stream:
+                if not leitor.texto and trecho:
+                    # Tempo até o primeiro token: fila + prefill do prompt no servidor
+                    metrics.observar("llm_ttft_ms", (time.perf_counter() - inicio) * 1000)
+                if leitor.alimentar(trecho):
+                    metrics.incrementar("llm_parada_antecipada")
+                    break
+        finally:
+            await stream.aclose()
+        metrics.observar("llm_latencia_ms", (time.perf_counter() - inicio) * 1000)
+        
+        return self._interpretar_leitor(leitor)
+    
+    async def _astream_local(self, texto: str) -> AsyncIterator[str]:
+        """
+        Trechos gerados pelo vLLM local
+        
+        O gerador do langchain não fecha a resposta HTTP ao ser fechado (o
+        servidor continuaria gerando até o fim); aqui a resposta é fechada
+        explicitamente, e o vLLM vê a desconexão e aborta a requisição.
+        """
+        stream = await self.cliente_local.chat.completions.create(**self._parametros_local(texto))
+        try:
+            async for parte in stream:
+                if parte.choices and parte.choices[0].delta.content:
+                    yield parte.choices[0].delta.content
+        finally:
+            await stream.response.aclose()
+    
+    def _stream_local(self, texto: str) -> Iterator[str]:
+        """Versão síncrona de `_astream_local`"""
+        stream = self.cliente_local_sync.chat.completions.create(**self._parametros_local(texto))
+        try:
+            for parte in stream:
+                if parte.choices and parte.choices[0].delta.content:
+                    yield parte.choices[0].delta.content
+        finally:
+            stream.response.close()
+    
+    @staticmethod
+    async def _astream_chain(texto: str, chain: Any) -> AsyncIterator[str]:
+        """Trechos gerados pela `chain` de um backend (via langchain)"""
+        async for parte in chain.astream({"entrada": texto}):
+            yield parte.content
+    
+    def _interpretar_leitor(self, leitor: JSONStreamParser) -> Dict[str, Any]:
+        """Resultado a partir da leitura incremental; sem objeto completo, usa o texto inteiro"""
+        if leitor.erro is not None:
+            return {"erro": leitor.erro}
+        if leitor.objeto is not None:
+            return self._converter_dados(leitor.objeto)
+        return self._interpretar_resposta(leitor.texto)
+    
+    async def _aresolver_sem_llm(self, texto: str) -> Optional[Dict[str, Any]]:
+        """Tenta resolver o texto pelo caminho rápido e depois pelo cache"""
+        # Caminho rápido: frases simples são resolvidas por regras, sem LLM
+        if self.regras:
+            resultado = self.regras.interpretar(texto)
+            if resultado is not None:
+                return resultado
+        
+        if self.cache:
+            return await self.cache.aobter(texto)
+        return None
+    
+    def _interpretar_resposta(self, conteudo: str) -> Dict[str, Any]:
+        """
+        Converte o conteúdo retornado pelo LLM no dicionário de saída
+        
+        Raises:
+            ValueError: Se os dados não passarem na validação do GastoFinanceiro
+        """
+        # Extrai o conteúdo da resposta
+        resposta_texto = conteudo.strip()
+        
+        # Remove markdown code blocks se existirem
+        if "```json" in resposta_texto:
+            resposta_texto = resposta_texto.split("```json")[1].split("```")[0].strip()
+        elif "```" in resposta_texto:
+            resposta_texto = resposta_texto.split("```")[1].split("```")[0].strip()
+        
+        # Tenta parsear como JSON
+        try:
+            dados = json.loads(resposta_texto)
+        except json.JSONDecodeError:
+            # Se não for JSON válido, tenta extrair JSON do texto
+            json_match = re.search(r'\{[^}]+\}', resposta_texto)
+            if json_match:
+                dados = json.loads(json_match.group())
+            else:
+                return {"erro": "resposta_invalida"}
+        
+        return self._converter_dados(dados)
+    
+    def _converter_dados(self, dados: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Valida o objeto JSON do LLM e monta o dicionário de saída
+        
+        Raises:
+            ValueError: Se os dados não passarem na validação do GastoFinanceiro
+        """
+        # Verifica se há erro na resposta
+        if "erro" in dados:
+            return {"erro": dados.get("erro", "nao_e_gasto")}
+        
+        # Valida e cria o objeto Pydantic
+        gasto = GastoFinanceiro(**dados)
+        
+        return {
+            "valor": gasto.valor,
+            "item": gasto.item,
+            "categoria": gasto.categoria,
+            "meio_pagamento": getattr(gasto, "meio_pagamento", None)
+        }
+    
+    def _tratar_erro(self, e: Exception) -> Dict[str, Any]:
+        """Converte exceções do processamento no dicionário de erro"""
+        if isinstance(e, ValueError):
             # Erro de validação do Pydantic (ex: valor negativo, formato inválido)
             error_msg = str(e)
             if "nao_e_gasto" in error_msg.lower() or "erro" in error_msg.lower():
                 return {"erro": "nao_e_gasto"}
             return {"erro": f"dados_invalidos: {error_msg}"}
-        except Exception as e:
-            # Outros erros (erro de conexão, formato inválido, etc.)
-            error_msg = str(e)
-            print(f"Erro ao processar LLM: {error_msg}")
-            # Verifica se é um erro de conexão
-            if "connection" in error_msg.lower() or "timeout" in error_msg.lower():
-                return {"erro": "servico_indisponivel"}
-            return {"erro": f"falha_processamento: {error_msg}"}
-
+        
+        # Outros erros (erro de conexão, formato inválido, etc.)
+        error_msg = str(e)
+        print(f"Erro ao processar LLM: {error_msg}")
+        # Verifica se é um erro de conexão
+        if "connection" in error_msg.lower() or "timeout" in error_msg.lower():
+            return {"erro": "servico_indisponivel"}
+        return {"erro": f"falha_processamento: {error_msg}"}
@@ -0,0 +1,343 @@
+"""
+Pré-processador determinístico de gastos (sem LLM)
+Reconhece frases simples como "café 5 reais no pix" ou "uber vinte e cinco no crédito"
+"""
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.metrics import metrics
+from app.models.schemas import GastoFinanceiro
+
+
+# Palavras-chave -> (item, categoria). Chaves sem acento, minúsculas.
+ITENS: Dict[str, Tuple[str, str]] = {
+    # Alimentação
+    "almoco": ("Almoço", "Alimentação"),
+    "jantar": ("Jantar", "Alimentação"),
+    "janta": ("Jantar", "Alimentação"),
+    "lanche": ("Lanche", "Alimentação"),
+    "cafe da manha": ("Café da manhã", "Alimentação"),
+    "pizza": ("Pizza", "Alimentação"),
+    "hamburguer": ("Hambúrguer", "Alimentação"),
+    "marmita": ("Marmita", "Alimentação"),
+    "mercado": ("Mercado", "Alimentação"),
+    "supermercado": ("Supermercado", "Alimentação"),
+    "padaria": ("Padaria", "Alimentação"),
+    "pao": ("Pão", "Alimentação"),
+    "feira": ("Feira", "Alimentação"),
+    "acougue": ("Açougue", "Alimentação"),
+    "restaurante": ("Restaurante", "Alimentação"),
+    "ifood": ("iFood", "Alimentação"),
+    "sorvete": ("Sorvete", "Alimentação"),
+    # Bebida
+    "cafe": ("Café", "Bebida"),
+    "cerveja": ("Cerveja", "Bebida"),
+    "chopp": ("Chopp", "Bebida"),
+    "refrigerante": ("Refrigerante", "Bebida"),
+    "refri": ("Refrigerante", "Bebida"),
+    "suco": ("Suco", "Bebida"),
+    "vinho": ("Vinho", "Bebida"),
+    "agua": ("Água", "Bebida"),
+    # Transporte
+    "uber": ("Uber", "Transporte"),
+    "taxi": ("Táxi", "Transporte"),
+    "onibus": ("Ônibus", "Transporte"),
+    "metro": ("Metrô", "Transporte"),
+    "gasolina": ("Gasolina", "Transporte"),
+    "combustivel": ("Combustível", "Transporte"),
+    "etanol": ("Etanol", "Transporte"),
+    "estacionamento": ("Estacionamento", "Transporte"),
+    "pedagio": ("Pedágio", "Transporte"),
+    # Lazer
+    "cinema": ("Cinema", "Lazer"),
+    "teatro": ("Teatro", "Lazer"),
+    "show": ("Show", "Lazer"),
+    "ingresso": ("Ingresso", "Lazer"),
+    "netflix": ("Netflix", "Lazer"),
+    "spotify": ("Spotify", "Lazer"),
+    # Saúde
+    "farmacia": ("Farmácia", "Saúde"),
+    "remedio": ("Remédio", "Saúde"),
+    "consulta": ("Consulta", "Saúde"),
+    "medico": ("Médico", "Saúde"),
+    "dentista": ("Dentista", "Saúde"),
+    "exame": ("Exame", "Saúde"),
+    # Moradia
+    "aluguel": ("Aluguel", "Moradia"),
+    "condominio": ("Condomínio", "Moradia"),
+    "conta de luz": ("Conta de luz", "Moradia"),
+    "conta de agua": ("Conta de água", "Moradia"),
+    "conta de gas": ("Conta de gás", "Moradia"),
+    "internet": ("Internet", "Moradia"),
+    "iptu": ("IPTU", "Moradia"),
+}
+
+# Palavras-chave -> meio de pagamento
+MEIOS_PAGAMENTO: Dict[str, str] = {
+    "cartao de credito": "Crédito",
+    "credito": "Crédito",
+    "cartao de debito": "Débito",
+    "debito": "Débito",
+    "pix": "Pix",
+    "vale refeicao": "Refeição",
+    "refeicao": "Refeição",
+    "vr": "Refeição",
+}
+
+# Indicam que o texto provavelmente não é um gasto simples
+PALAVRAS_AMBIGUAS = {
+    "recebi", "ganhei", "salario", "vendi", "devolveram", "devolvi",
+    "emprestei", "emprestimo", "parcelas", "parcelado", "cada",
+    # Intenção: "vou gastar 50 no mercado", "devo pagar amanhã"
+    "vou", "vai", "vamos", "quero", "queria", "pretendo", "preciso", "devo", "deve",
+    # Negação: "pão 10 reais sem pagar"
+    "nao", "sem", "nem", "nunca",
+    # Outra pessoa pagou: "cinema 30 reais meu amigo pagou"
+    "pagou", "pagaram", "amigo", "amiga", "amigos", "amigas",
+}
+
+# Mesmo papel, por prefixo: "reembolso", "reembolsaram", "cancelei", "estornado"...
+PREFIXOS_AMBIGUOS = ("reembols", "cancel", "estorn")
+
+# Meio de pagamento citado sem ser um dos aceitos ("no cartão": crédito ou débito?)
+MEIOS_INDEFINIDOS = {"cartao"}
+
+# Outras moedas e modificadores do valor: "20 dólares", "uns 30", "50 de desconto"
+QUALIFICADORES_VALOR = {
+    "dolar", "dolares", "usd", "us$", "euro", "euros", "eur", "libra", "libras",
+    "peso", "pesos", "iene", "ienes", "bitcoin", "btc", "cripto",
+    "k", "mi", "milhao", "milhoes", "bilhao", "bilhoes",
+    "mais", "menos", "quase", "cerca", "uns", "umas", "aproximadamente", "metade",
+    "meio", "dobro", "vezes", "x", "porcento", "desconto", "gorjeta", "taxa",
+    "juros", "frete", "troco", "dividido", "dividimos", "dividi", "rachei", "rachamos",
+}
+
+# Palavras que não alteram a interpretação da frase
+PALAVRAS_NEUTRAS = {
+    "gastei", "paguei", "comprei", "compra", "gasto", "foi", "deu", "custou",
+    "com", "no", "na", "nos", "nas", "de", "do", "da", "em", "um", "uma", "o", "a",
+    "os", "as", "por", "pra", "para", "pelo", "pela", "e", "hoje", "ontem", "agora",
+    "reais", "real", "r$", "rs", "centavos", "conto", "contos", "pila", "meu", "minha",
+    "via", "pago", "paga", "pro",
+}
+
+UNIDADES = {
+    "zero": 0, "um": 1, "uma": 1, "dois": 2, "duas": 2, "tres": 3, "quatro": 4,
+    "cinco": 5, "seis": 6, "sete": 7, "oito": 8, "nove": 9, "dez": 10, "onze": 11,
+    "doze": 12, "treze": 13, "quatorze": 14, "catorze": 14, "quinze": 15,
+    "dezesseis": 16, "dezessete": 17, "dezoito": 18, "dezenove": 19,
+}
+DEZENAS = {
+    "vinte": 20, "trinta": 30, "quarenta": 40, "cinquenta": 50, "sessenta": 60,
+    "setenta": 70, "oitenta": 80, "noventa": 90,
+}
+CENTENAS = {
+    "cem": 100, "cento": 100, "duzentos": 200, "duzentas": 200, "trezentos": 300,
+    "trezentas": 300, "quatrocentos": 400, "quatrocentas": 400, "quinhentos": 500,
+    "quinhentas": 500, "seiscentos": 600, "seiscentas": 600, "setecentos": 700,
+    "setecentas": 700, "oitocentos": 800, "oitocentas": 800, "novecentos": 900,
+    "novecentas": 900,
+}
+NUMEROS_POR_EXTENSO = {**UNIDADES, **DEZENAS, **CENTENAS, "mil": 1000}
+
+RE_NUMERO = re.compile(r"^(?:r\$)?(\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?|\d+(?:[.,]\d{1,2})?)(?:r\$)?$")
+
+
+class RuleParser:
+    """Extrai gastos simples por regras; devolve None quando não há confiança suficiente"""
+
+    # Penalidade de confiança por palavra não reconhecida
+    PENALIDADE_PALAVRA = 0.05
+
+    def __init__(self, confianca_minima: float):
+        self.confianca_minima = confianca_minima
+        self.acertos = 0
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+        self._chaves_item = sorted(ITENS, key=lambda k: -len(k.split()))
+        self._chaves_meio = sorted(MEIOS_PAGAMENTO, key=lambda k: -len(k.split()))
+        metrics.registrar_coletor("fast_path", self.estatisticas)
+
+    def interpretar(self, texto: str) -> Optional[Dict[str, Any]]:
+        """
+        Tenta extrair o gasto sem LLM
+
+        Returns:
+            Dicionário no mesmo formato de `LLMService.processar` ou None
+            se a confiança ficar abaixo de `confianca_minima`
+        """
+        resultado, confianca = self._extrair(texto)
+        if resultado is None or confianca < self.confianca_minima:
+            self._contabilizar(False)
+            return None
+        self._contabilizar(True)
+        return resultado
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Taxa de acerto do caminho rápido"""
+        total = self.acertos + self.fallbacks
+        return {
+            "acertos": self.acertos,
+            "fallbacks": self.fallbacks,
+            "hit_ratio": self.acertos / total if total else 0.0,
+        }
+
+    def _contabilizar(self, acerto: bool):
+        with self._lock:
+            if acerto:
+                self.acertos += 1
+            else:
+                self.fallbacks += 1
+        metrics.incrementar("fast_path_acertos" if acerto else "fast_path_fallbacks")
+
+    def _extrair(self, texto: str) -> Tuple[Optional[Dict[str, Any]], float]:
+        tokens = self._tokenizar(texto)
+        if not tokens or any(self._ambigua(t) for t in tokens):
+            return None, 0.0
+
+        itens, tokens = self._consumir(tokens, self._chaves_item, ITENS)
+        meios, tokens = self._consumir(tokens, self._chaves_meio, MEIOS_PAGAMENTO)
+        # "cartão" que sobrou não veio com "de crédito"/"de débito": fica para o LLM
+        if any(t in MEIOS_INDEFINIDOS for t in tokens):
+            return None, 0.0
+        valores, seguintes, tokens = self._consumir_valores(tokens)
+
+        # Exige exatamente um valor, um item e no máximo um meio de pagamento
+        if len(valores) != 1 or len(set(itens)) != 1 or len(set(meios)) > 1:
+            return None, 0.0
+
+        # Palavra desconhecida logo após o valor pode mudar a moeda ou o valor
+        # ("20 pesos", "20 mangos"): fica para o LLM
+        if any(t not in PALAVRAS_NEUTRAS for t in seguintes):
+            return None, 0.0
+
+        desconhecidas = [t for t in tokens if t not in PALAVRAS_NEUTRAS]
+        confianca = 1.0 - self.PENALIDADE_PALAVRA * len(desconhecidas)
+
+        item, categoria = itens[0]
+        try:
+            gasto = GastoFinanceiro(
+                valor=valores[0],
+                item=item,
+                categoria=categoria,
+                meio_pagamento=meios[0] if meios else None
+            )
+        except ValueError:
+            return None, 0.0
+
+        return {
+            "valor": gasto.valor,
+            "item": gasto.item,
+            "categoria": gasto.categoria,
+            "meio_pagamento": gasto.meio_pagamento
+        }, confianca
+
+    @staticmethod
+    def _ambigua(token: str) -> bool:
+        """Palavra que muda o sentido da frase (não é gasto, não foi pago, outra moeda...)"""
+        return (
+            token in PALAVRAS_AMBIGUAS
+            or token in QUALIFICADORES_VALOR
+            or token.startswith(PREFIXOS_AMBIGUOS)
+        )
+
+    @staticmethod
+    def _tokenizar(texto: str) -> List[str]:
+        """Minúsculas, sem acentos, separado em palavras (mantém números como 1.200,50)"""
+        texto = unicodedata.normalize("NFKD", texto.casefold())
+        texto = "".join(c for c in texto if not unicodedata.combining(c))
+        texto = re.sub(r"r\$\s*", "r$", texto)
+        return re.findall(r"r\$[\d.,]+|[\d.,]*\d|[a-z$]+", texto)
+
+    @staticmethod
+    def _consumir(tokens: List[str], chaves: List[str], tabela: Dict[str, Any]):
+        """Remove as expressões encontradas (mais longas primeiro) e retorna seus valores"""
+        encontrados = []
+        restantes = list(tokens)
+        for chave in chaves:
+            partes = chave.split()
+            tamanho = len(partes)
+            i = 0
+            while i + tamanho <= len(restantes):
+                if restantes[i:i + tamanho] == partes:
+                    encontrados.append(tabela[chave])
+                    del restantes[i:i + tamanho]
+                else:
+                    i += 1
+        return encontrados, restantes
+
+    def _consumir_valores(self, tokens: List[str]):
+        """
+        Extrai valores em algarismos ou por extenso ("vinte e cinco reais e cinquenta centavos")
+
+        Returns:
+            (valores, palavras logo após cada valor sem "reais", palavras restantes)
+        """
+        valores = []
+        seguintes = []
+        restantes = []
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            numero = self._converter_numero(token)
+            if numero is not None:
+                valores.append(numero)
+                i += 1
+                if i < len(tokens) and not token.startswith("r$"):
+                    seguintes.append(tokens[i])
+                continue
+
+            proximo = tokens[i + 1] if i + 1 < len(tokens) else None
+            artigo = token in ("um", "uma") and proximo not in ("real", "reais", "mil")
+            if token in NUMEROS_POR_EXTENSO and not artigo:
+                valor, i = self._ler_extenso(tokens, i)
+                # "vinte reais e cinquenta centavos"
+                if i < len(tokens) and tokens[i] in ("reais", "real"):
+                    i += 1
+                    if i + 1 < len(tokens) and tokens[i] == "e" and tokens[i + 1] in NUMEROS_POR_EXTENSO:
+                        centavos, j = self._ler_extenso(tokens, i + 1)
+                        if j < len(tokens) and tokens[j] == "centavos" and centavos < 100:
+                            valor += centavos / 100
+                            i = j + 1
+                elif i < len(tokens):
+                    seguintes.append(tokens[i])
+                valores.append(valor)
+                continue
+
+            restantes.append(token)
+            i += 1
+        return valores, seguintes, restantes
+
+    @staticmethod
+    def _converter_numero(token: str) -> Optional[float]:
+        correspondencia = RE_NUMERO.match(token)
+        if not correspondencia:
+            return None
+        numero = correspondencia.group(1)
+        if "," in numero:
+            numero = numero.replace(".", "").replace(",", ".")
+        elif re.fullmatch(r"\d{1,3}(?:\.\d{3})+", numero):
+            numero = numero.replace(".", "")  # "1.200" -> milhar
+        return float(numero)
+
+    @staticmethod
+    def _ler_extenso(tokens: List[str], inicio: int) -> Tuple[float, int]:
+        """Lê um número por extenso a partir de `inicio`; retorna (valor, próxima posição)"""
+        total = 0
+        atual = 0
+        i = inicio
+        while i < len(tokens):
+            token = tokens[i]
+            if token == "mil":
+                total += (atual or 1) * 1000
+                atual = 0
+            elif token in NUMEROS_POR_EXTENSO:
+                atual += NUMEROS_POR_EXTENSO[token]
+            elif token == "e" and i + 1 < len(tokens) and tokens[i + 1] in NUMEROS_POR_EXTENSO \
+                    and tokens[i + 1] != "mil":
+                pass
+            else:
+                break
+            i += 1
+        return float(total + atual), i
@@ -2,10 +2,33 @@
 Serviço de transcrição de áudio usando Whisper
 Suporta modo local e API original
 """
+import hashlib
+import json
 import os
+import uuid
+from typing import Any, AsyncIterator, Dict, Optional, Union
+import httpx
 import requests
-from fastapi import HTTPException
+from requests.adapters import HTTPAdapter
+from fastapi import HTTPException, UploadFile
 from app.config import settings
+from app.services.cache_service import TranscriptionCache
+
+
+def content_type_audio(filename: Optional[str], content_type: Optional[str]) -> str:
+    """Tipo MIME do áudio; detectado pela extensão quando não informado"""
+    if content_type:
+        return content_type
+    filename = filename or "audio.webm"
+    if filename.endswith(".webm"):
+        return "audio/webm"
+    elif filename.endswith(".mp3"):
+        return "audio/mpeg"
+    elif filename.endswith(".wav"):
+        return "audio/wav"
+    elif filename.endswith(".m4a"):
+        return "audio/mp4"
+    return "audio/webm"  # Padrão para gravações do navegador
 
 
 class TranscriptionService:
@@ -14,6 +37,48 @@ class TranscriptionService:
     def __init__(self):
         self.mode = settings.WHISPER_MODE
         self.url = settings.WHISPER_URL
+        self.stream_url = settings.WHISPER_STREAM_URL or f"{self.url.rstrip('/')}/stream"
+        self.chunk_size = settings.WHISPER_CHUNK_SIZE
+        self.timeout = httpx.Timeout(
+            connect=settings.WHISPER_CONNECT_TIMEOUT,
+            read=settings.WHISPER_READ_TIMEOUT,
+            write=settings.WHISPER_READ_TIMEOUT,
+            pool=settings.WHISPER_CONNECT_TIMEOUT
+        )
+        self.limits = httpx.Limits(
+            max_connections=settings.WHISPER_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.WHISPER_MAX_KEEPALIVE
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        # Sessão síncrona reaproveitada (keep-alive) para `transcrever`
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.WHISPER_MAX_CONNECTIONS
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        
+        self.cache = TranscriptionCache(
+            diretorio=settings.TRANSCRIPTION_CACHE_DIR,
+            max_bytes=settings.TRANSCRIPTION_CACHE_MAX_MB * 1024 * 1024,
+            modelo=settings.WHISPER_MODEL,
+            idioma=settings.WHISPER_LANGUAGE
+        ) if settings.TRANSCRIPTION_CACHE_ENABLED else None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Obtém o cliente HTTP assíncrono de longa duração (criado sob demanda)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self._client
+    
+    async def aclose(self):
+        """Fecha as conexões abertas com o serviço de transcrição"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._session.close()
     
     def transcrever(self, file_content: bytes, filename: str, content_type: str) -> str:
         """
@@ -32,15 +97,29 @@ class TranscriptionService:
         """
         url = self.url
         
+        chave = None
+        if self.cache:
+            chave = self.cache.chave(hashlib.sha256(file_content).hexdigest())
+            texto = self.cache.obter(chave)
+            if texto is not None:
+                return texto
+        
         try:
             files = {
                 'file': (filename, file_content, content_type)
             }
-            response = requests.post(url, files=files, timeout=60)
+            response = self._session.post(
+                url,
+                files=files,
+                timeout=(settings.WHISPER_CONNECT_TIMEOUT, settings.WHISPER_READ_TIMEOUT)
+            )
             response.raise_for_status()
             
             resultado = response.json()
-            return resultado.get("text", "")
+            texto = resultado.get("text", "")
+            if chave and texto.strip():
+                self.cache.guardar(chave, texto)
+            return texto
             
         except requests.exceptions.RequestException as e:
             error_msg = f"Erro na conexão com serviço de transcrição: {e}"
@@ -57,6 +136,165 @@ class TranscriptionService:
                 detail=error_msg
             )
     
+    async def atranscrever(
+        self,
+        arquivo: Union[bytes, UploadFile],
+        filename: str,
+        content_type: str
+    ) -> str:
+        """
+        Versão assíncrona de `transcrever`, não bloqueia o event loop
+        
+        O corpo multipart é enviado em blocos de `WHISPER_CHUNK_SIZE` bytes,
+        lidos diretamente do `UploadFile`, sem carregar o áudio inteiro em memória.
+        
+        Args:
+            arquivo: Conteúdo em bytes ou o `UploadFile` recebido
+            filename: Nome do arquivo
+            content_type: Tipo MIME do arquivo
+            
+        Returns:
+            Texto transcrito
+            
+        Raises:
+            HTTPException: Se houver erro na transcrição
+        """
+        url = self.url
+        boundary = uuid.uuid4().hex
+        
+        chave = None
+        if self.cache:
+            chave = self.cache.chave(await self._hash_audio(arquivo))
+            texto = await self.cache.aobter(chave)
+            if texto is not None:
+                return texto
+        
+        try:
+            client = self._get_client()
+            response = await client.post(
+                url,
+                content=self._corpo_multipart(arquivo, filename, content_type, boundary),
+                headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+            )
+            response.raise_for_status()
+            
+            resultado = response.json()
+            texto = resultado.get("text", "")
+            if chave and texto.strip():
+                await self.cache.aguardar(chave, texto)
+            return texto
+            
+        except httpx.HTTPError as e:
+            error_msg = f"Erro na conexão com serviço de transcrição: {e}"
+            print(error_msg)
+            raise HTTPException(
+                status_code=502,
+                detail=f"Serviço de transcrição indisponível: {str(e)}"
+            )
+        except Exception as e:
+            error_msg = f"Erro ao processar transcrição: {e}"
+            print(error_msg)
+            raise HTTPException(
+                status_code=500,
+                detail=error_msg
+            )
+    
+    async def atranscrever_stream(
+        self,
+        arquivo: Union[bytes, UploadFile],
+        filename: str,
+        content_type: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Transcreve o áudio entregando os segmentos conforme o Whisper os gera
+        
+        Gera eventos {"tipo": "segmento", "inicio", "fim", "texto"} e, por último,
+        {"tipo": "fim", "text", ...}. Com a transcrição em cache, só o evento final.
+        
+        Raises:
+            HTTPException: Se houver erro na transcrição
+        """
+        chave = None
+        if self.cache:
+            chave = self.cache.chave(await self._hash_audio(arquivo))
+            texto = await self.cache.aobter(chave)
+            if texto is not None:
+                yield {"tipo": "fim", "text": texto}
+                return
+        
+        boundary = uuid.uuid4().hex
+        try:
+            client = self._get_client()
+            async with client.stream(
+                "POST",
+                self.stream_url,
+                content=self._corpo_multipart(arquivo, filename, content_type, boundary),
+                headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+            ) as response:
+                response.raise_for_status()
+                async for linha in response.aiter_lines():
+                    if not linha.strip():
+                        continue
+                    evento = json.loads(linha)
+                    if evento.get("tipo") == "erro":
+                        raise HTTPException(
+                            status_code=502,
+                            detail=f"Erro no serviço de transcrição: {evento.get('detail')}"
+                        )
+                    if evento.get("tipo") == "fim":
+                        texto = evento.get("text", "")
+                        if chave and texto.strip():
+                            await self.cache.aguardar(chave, texto)
+                    yield evento
+                    
+        except httpx.HTTPError as e:
+            error_msg = f"Erro na conexão com serviço de transcrição: {e}"
+            print(error_msg)
+            raise HTTPException(
+                status_code=502,
+                detail=f"Serviço de transcrição indisponível: {str(e)}"
+            )
+    
+    async def _hash_audio(self, arquivo: Union[bytes, UploadFile]) -> str:
+        """sha256 do áudio, lido em blocos; o `UploadFile` volta para o início"""
+        if isinstance(arquivo, bytes):
+            return hashlib.sha256(arquivo).hexdigest()
+        
+        digest = hashlib.sha256()
+        while True:
+            bloco = await arquivo.read(self.chunk_size)
+            if not bloco:
+                break
+            digest.update(bloco)
+        await arquivo.seek(0)
+        return digest.hexdigest()
+    
+    async def _corpo_multipart(
+        self,
+        arquivo: Union[bytes, UploadFile],
+        filename: str,
+        content_type: str,
+        boundary: str
+    ) -> AsyncIterator[bytes]:
+        """Gera o corpo multipart/form-data em blocos a partir do arquivo"""
+        nome = filename.replace('"', "%22")
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{nome}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode()
+        
+        if isinstance(arquivo, bytes):
+            yield arquivo
+        else:
+            while True:
+                bloco = await arquivo.read(self.chunk_size)
+                if not bloco:
+                    break
+                yield bloco
+        
+        yield f"\r\n--{boundary}--\r\n".encode()
+    
     def transcrever_arquivo_local(self, file_path: str) -> str:
         """
         Transcreve um arquivo de áudio do disco local
@@ -0,0 +1,145 @@
+"""
+Chamadas em lote ao vLLM pela rota /v1/completions
+Várias entradas vão em uma única requisição, com uma lista de prompts
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+import httpx
+from langchain_core.prompts import ChatPromptTemplate
+from app.config import settings
+from app.core.metrics import metrics
+
+
+class VLLMBatchClient:
+    """
+    Gera as respostas de várias entradas em uma requisição /v1/completions
+
+    /v1/chat/completions recebe uma conversa por requisição, enquanto
+    /v1/completions aceita uma lista de prompts, que o vLLM agenda como um
+    lote só. Para o texto ser o mesmo da rota de chat, o template de chat do
+    modelo é obtido uma vez do próprio servidor (/tokenize com as mensagens e
+    /detokenize), com um marcador no lugar da entrada; cada prompt é o
+    template com o marcador substituído pelo texto.
+    """
+
+    MARCADOR = "[[ENTRADA-GASTO]]"
+    # Resposta de `gerar` quando o servidor não aceita lotes: a entrada volta para a rota de chat
+    SEM_LOTE = object()
+
+    def __init__(self, prompt_template: ChatPromptTemplate, esquema: Optional[Dict[str, Any]]):
+        """
+        Args:
+            prompt_template: O mesmo template usado pela chain de chat
+            esquema: JSON Schema para guided decoding (None desativa)
+        """
+        self.prompt_template = prompt_template
+        self.esquema = esquema
+        # LLM_URL aponta para .../v1; /tokenize e /detokenize ficam na raiz
+        self.url = settings.LLM_URL.rstrip("/")
+        self.url_raiz = self.url[:-3] if self.url.endswith("/v1") else self.url
+        self.disponivel = True  # False se o servidor não tem /tokenize (não é vLLM)
+        self._partes: Optional[Tuple[str, str]] = None  # Template antes/depois da entrada
+        self._lock = asyncio.Lock()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=settings.LLM_MICROBATCH_TIMEOUT,
+                headers={"Authorization": f"Bearer {settings.LLM_API_KEY}"}
+            )
+        return self._client
+
+    async def aclose(self):
+        """Fecha o pool de conexões com o vLLM"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def gerar(self, textos: List[str]) -> List[Union[str, Exception]]:
+        """
+        Gera a resposta de cada texto em uma única requisição
+
+        Returns:
+            O texto gerado (ou a exceção) por entrada, na mesma ordem; `SEM_LOTE`
+            em todas se o servidor não é um vLLM com /tokenize
+        """
+        try:
+            partes = await self._obter_partes()
+            if partes is None:
+                return [self.SEM_LOTE] * len(textos)
+            prefixo, sufixo = partes
+            corpo = {
+                "model": settings.LLM_MODEL,
+                "prompt": [prefixo + texto + sufixo for texto in textos],
+                "temperature": 0,
+                "max_tokens": settings.LLM_MAX_TOKENS,
+                # O template já traz o token de início; não repetir
+                "add_special_tokens": False
+            }
+            if self.esquema is not None:
+                corpo["guided_json"] = self.esquema
+
+            inicio = time.perf_counter()
+            response = await self._get_client().post(f"{self.url}/completions", json=corpo)
+            response.raise_for_status()
+            metrics.observar("llm_microlote_latencia_ms", (time.perf_counter() - inicio) * 1000)
+            metrics.incrementar("llm_microlote_requisicoes")
+
+            respostas: List[Union[str, Exception]] = [
+                RuntimeError("Resposta ausente no lote")
+            ] * len(textos)
+            for escolha in response.json()["choices"]:
+                respostas[escolha["index"]] = escolha["text"]
+            return respostas
+        except Exception as e:
+            return [e] * len(textos)
+
+    async def _obter_partes(self) -> Optional[Tuple[str, str]]:
+        """
+        Template de chat renderizado pelo servidor, dividido no marcador (cacheado)
+
+        Returns:
+            (antes, depois) da entrada; None se o servidor não permite montar o
+            prompt (sem /tokenize ou template que não preserva a entrada)
+        """
+        if self._partes is not None or not self.disponivel:
+            return self._partes
+        async with self._lock:
+            if self._partes is not None or not self.disponivel:
+                return self._partes
+
+            mensagens = [
+                {"role": "system" if mensagem.type == "system" else "user", "content": mensagem.content}
+                for mensagem in self.prompt_template.format_messages(entrada=self.MARCADOR)
+            ]
+            client = self._get_client()
+            try:
+                response = await client.post(f"{self.url_raiz}/tokenize", json={
+                    "model": settings.LLM_MODEL,
+                    "messages": mensagens,
+                    "add_generation_prompt": True
+                })
+                if response.status_code == 404:
+                    # Não é um vLLM: não é falha do backend, a rota de chat continua valendo
+                    self.disponivel = False
+                    print("Servidor LLM sem /tokenize; micro-lotes desativados")
+                    return None
+                response.raise_for_status()
+                response = await client.post(f"{self.url_raiz}/detokenize", json={
+                    "model": settings.LLM_MODEL,
+                    "tokens": response.json()["tokens"]
+                })
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                raise RuntimeError(f"Erro ao obter o template de chat do vLLM: {e}")
+
+            texto = response.json()["prompt"]
+            if texto.count(self.MARCADOR) != 1:
+                self.disponivel = False
+                print("Template de chat do vLLM não preserva a entrada; micro-lotes desativados")
+                return None
+
+            self._partes = tuple(texto.split(self.MARCADOR))
+            return self._partes
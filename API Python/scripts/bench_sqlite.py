@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark do perfil de desempenho do SQLite
+
+Executa a mesma carga duas vezes, em um banco temporário, com os PRAGMAs
+padrão do SQLite (SQLITE_TUNING=false) e com o perfil da aplicação
+(WAL, synchronous=NORMAL, busy_timeout, mmap, cache e temp_store):
+
+- inserções: um commit por gasto, como em POST /api/gastos
+- listagens: primeira página de GET /api/gastos (40 itens)
+- misto: threads escrevendo e listando ao mesmo tempo, contando os erros
+  "database is locked"
+
+Uso:
+    python scripts/bench_sqlite.py --insercoes 2000 --listagens 2000 --segundos 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _executar_carga(args):
+    """Roda a carga no processo atual (DATABASE_URL/SQLITE_TUNING já definidos)"""
+    sys.path.insert(0, RAIZ)
+    from sqlalchemy.exc import OperationalError
+    from app.database.models import SessionLocal, Gasto, init_db
+    from app.database.resumo import registrar_gastos
+
+    init_db()
+
+    def inserir(db, i):
+        gasto = Gasto(valor=10 + i % 90, item=f"item {i}", categoria="Outros", meio_pagamento="Pix")
+        db.add(gasto)
+        db.flush()
+        registrar_gastos(db, [gasto])
+        db.commit()
+
+    def listar(db):
+        return (
+            db.query(Gasto)
+            .order_by(Gasto.data_criacao.desc(), Gasto.id.desc())
+            .limit(40)
+            .all()
+        )
+
+    resultado = {}
+
+    with SessionLocal() as db:
+        inicio = time.perf_counter()
+        for i in range(args.insercoes):
+            inserir(db, i)
+        resultado["insercoes_por_s"] = args.insercoes / (time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        for _ in range(args.listagens):
+            listar(db)
+            db.rollback()  # encerra a transação de leitura, como ao fim de cada requisição
+        resultado["listagens_por_s"] = args.listagens / (time.perf_counter() - inicio)
+
+    contagem = {"escritas": 0, "leituras": 0, "bloqueios": 0}
+    lock = threading.Lock()
+    fim = time.perf_counter() + args.segundos
+
+    def trabalhador(escritor):
+        with SessionLocal() as db:
+            i = 0
+            while time.perf_counter() < fim:
+                try:
+                    if escritor:
+                        inserir(db, i)
+                    else:
+                        listar(db)
+                        db.rollback()
+                    chave = "escritas" if escritor else "leituras"
+                except OperationalError as e:
+                    db.rollback()
+                    if "locked" not in str(e):
+                        raise
+                    chave = "bloqueios"
+                with lock:
+                    contagem[chave] += 1
+                i += 1
+
+    threads = [threading.Thread(target=trabalhador, args=(True,)) for _ in range(args.escritores)]
+    threads += [threading.Thread(target=trabalhador, args=(False,)) for _ in range(args.leitores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    resultado["misto_escritas_por_s"] = contagem["escritas"] / args.segundos
+    resultado["misto_leituras_por_s"] = contagem["leituras"] / args.segundos
+    resultado["misto_bloqueios"] = contagem["bloqueios"]
+    print(json.dumps(resultado))
+
+
+def _rodar_perfil(args, otimizado: bool) -> dict:
+    """Executa a carga em um subprocesso com um banco novo"""
+    with tempfile.TemporaryDirectory() as pasta:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(pasta, 'bench.db')}",
+            SQLITE_TUNING="true" if otimizado else "false",
+            LLM_CACHE_ENABLED="false"
+        )
+        saida = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--carga", *sys.argv[1:]],
+            env=env,
+            cwd=RAIZ,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do perfil de desempenho do SQLite")
+    parser.add_argument("--insercoes", type=int, default=2000)
+    parser.add_argument("--listagens", type=int, default=2000)
+    parser.add_argument("--segundos", type=float, default=5, help="Duração da carga mista")
+    parser.add_argument("--escritores", type=int, default=2)
+    parser.add_argument("--leitores", type=int, default=4)
+    parser.add_argument("--carga", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.carga:
+        _executar_carga(args)
+        return
+
+    padrao = _rodar_perfil(args, otimizado=False)
+    otimizado = _rodar_perfil(args, otimizado=True)
+
+    print(f"{'métrica':<24}{'padrão':>12}{'otimizado':>12}")
+    for chave in padrao:
+        print(f"{chave:<24}{padrao[chave]:>12.1f}{otimizado[chave]:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
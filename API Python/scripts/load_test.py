@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Teste de carga para os endpoints de processamento
+
+Dispara requisições concorrentes contra a API em execução e mede a
+concorrência efetiva (soma das latências / tempo total). Com o pipeline
+assíncrono ela deve crescer junto com o número de requisições em voo;
+se o event loop estiver bloqueado ela fica presa em ~1.
+
+Em paralelo, o `/health` é consultado continuamente: sua latência deve
+permanecer baixa mesmo com chamadas lentas ao LLM/Whisper em andamento.
+
+Uso:
+    python scripts/load_test.py --url http://localhost:8001 --concorrencia 1 4 16
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+TEXTOS = [
+    "Gastei 50 reais com almoço no crédito",
+    "Comprei um café por 5 reais",
+    "uber 20 no crédito",
+    "farmácia 32,90 no débito",
+]
+
+
+def _percentil(valores, p):
+    """Percentil simples (nearest-rank) de uma lista de valores"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+async def _requisicao(client, url, indice, audio):
+    """Executa uma requisição de processamento e retorna sua latência"""
+    inicio = time.perf_counter()
+    if audio:
+        with open(audio, "rb") as f:
+            files = {"file": (audio, f.read(), "application/octet-stream")}
+        response = await client.post(f"{url}/api/processar-audio", files=files)
+    else:
+        texto = TEXTOS[indice % len(TEXTOS)]
+        response = await client.post(f"{url}/api/processar-texto", json={"texto": texto})
+    response.raise_for_status()
+    return time.perf_counter() - inicio
+
+
+async def _sondar_health(client, url, parar, latencias):
+    """Consulta /health continuamente enquanto a carga estiver rodando"""
+    while not parar.is_set():
+        inicio = time.perf_counter()
+        await client.get(f"{url}/health")
+        latencias.append(time.perf_counter() - inicio)
+        await asyncio.sleep(0.05)
+
+
+async def _rodada(url, concorrencia, total, audio):
+    """Executa `total` requisições com no máximo `concorrencia` em voo"""
+    limites = httpx.Limits(max_connections=concorrencia + 1)
+    async with httpx.AsyncClient(timeout=300, limits=limites) as client:
+        semaforo = asyncio.Semaphore(concorrencia)
+
+        async def limitada(indice):
+            async with semaforo:
+                return await _requisicao(client, url, indice, audio)
+
+        parar = asyncio.Event()
+        latencias_health = []
+        sonda = asyncio.create_task(_sondar_health(client, url, parar, latencias_health))
+
+        inicio = time.perf_counter()
+        latencias = await asyncio.gather(*(limitada(i) for i in range(total)))
+        duracao = time.perf_counter() - inicio
+
+        parar.set()
+        await sonda
+
+    return {
+        "concorrencia": concorrencia,
+        "requisicoes": total,
+        "duracao_s": duracao,
+        "throughput_rps": total / duracao,
+        "p50_ms": statistics.median(latencias) * 1000,
+        "p95_ms": _percentil(latencias, 95) * 1000,
+        "concorrencia_efetiva": sum(latencias) / duracao,
+        "health_p95_ms": _percentil(latencias_health, 95) * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do pipeline de processamento")
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requisicoes", type=int, default=32, help="Requisições por rodada")
+    parser.add_argument("--audio", help="Arquivo de áudio (usa /api/processar-audio)")
+    args = parser.parse_args()
+
+    print(f"{'conc':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'conc. efetiva':>14} {'health p95 ms':>14}")
+    for concorrencia in args.concorrencia:
+        r = await _rodada(args.url, concorrencia, args.requisicoes, args.audio)
+        print(
+            f"{r['concorrencia']:>5} {r['throughput_rps']:>8.2f} {r['p50_ms']:>9.1f} "
+            f"{r['p95_ms']:>9.1f} {r['concorrencia_efetiva']:>14.2f} {r['health_p95_ms']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+"""
+Testes da importação em massa (/api/gastos/importar)
+"""
+import os
+import tempfile
+
+# O banco é configurado na importação de app.config: aponta para um arquivo temporário
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/importacao.db"
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.importacao import router
+from app.database.models import init_db, SessionLocal, Gasto
+
+init_db()
+app = FastAPI()
+app.include_router(router, prefix="/api")
+client = TestClient(app)
+
+
+def importar_csv(conteudo: str):
+    response = client.post(
+        "/api/gastos/importar",
+        files={"file": ("extrato.csv", conteudo.encode("utf-8"), "text/csv")}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def valores_importados(item: str):
+    with SessionLocal() as db:
+        return sorted(gasto.valor for gasto in db.query(Gasto).filter(Gasto.item == item))
+
+
+def test_valor_brasileiro_com_milhar():
+    resposta = importar_csv('valor;item;categoria\n1.234,56;Brasileiro;Outros\n"12,5";Brasileiro;Outros\n')
+    assert resposta["importados"] == 2
+    assert valores_importados("Brasileiro") == [12.5, 1234.56]
+
+
+def test_valor_com_ponto_decimal():
+    resposta = importar_csv("valor,item,categoria\n1234.56,Ponto,Outros\n1.234,Ponto,Outros\n")
+    assert resposta["importados"] == 2
+    assert valores_importados("Ponto") == [1.234, 1234.56]
+
+
+def test_valor_ambiguo_rejeitado():
+    resposta = importar_csv('valor;item;categoria\n1,234.56;Ambiguo;Outros\n1.23,4;Ambiguo;Outros\n10;Ambiguo;Outros\n')
+    assert resposta["importados"] == 1
+    assert resposta["rejeitados"] == 2
+    assert [erro["linha"] for erro in resposta["erros"]] == [2, 3]
+    assert all("Valor inválido" in erro["erro"] for erro in resposta["erros"])
+    assert valores_importados("Ambiguo") == [10.0]
@@ -5,4 +5,5 @@ docker run --gpus all \
     vllm/vllm-openai:latest \
     --model neuralmagic/Llama-3.2-3B-Instruct-quantized.w8a8 \
     --gpu-memory-utilization 0.7 \
-    --max-model-len 8192
+    --max-model-len 8192 \
+    --enable-prefix-caching
@@ -1,38 +1,227 @@
-from fastapi import FastAPI, UploadFile, File
-from faster_whisper import WhisperModel
+from contextlib import asynccontextmanager
+from collections import deque
+from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi.responses import StreamingResponse
+from faster_whisper import WhisperModel, BatchedInferencePipeline, decode_audio
+import asyncio
+import json
+import threading
+import queue
 import tempfile
+import time
 import os
 
-app = FastAPI(title="Whisper GPU API")
-
 MODEL_ROOT = os.getenv("HF_HOME", "/models")
+NUM_WORKERS = int(os.getenv("WHISPER_WORKERS", "2"))         # threads consumindo a fila
+BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))        # lote do pipeline em lote
+MAX_FILA = int(os.getenv("WHISPER_MAX_FILA", "64"))           # acima disso responde 503
+SPOOL_MAX = 1024 * 1024        # cópia do upload no streaming: em memória até 1 MB, depois em disco
 
 model = WhisperModel(
     "small",
     device="cuda",
     compute_type="float16",
-    download_root=MODEL_ROOT
+    download_root=MODEL_ROOT,
+    num_workers=NUM_WORKERS    # permite transcrições simultâneas no mesmo modelo
 )
+batched_model = BatchedInferencePipeline(model=model)
+
+# Fila de clipes aguardando transcrição:
+# (arquivo, futuro, loop, enfileirado_em, ao_segmento ou None)
+fila = queue.Queue(maxsize=MAX_FILA)
+
+# Estatísticas para /metrics
+estatisticas_lock = threading.Lock()
+em_processamento = 0
+latencias_ms = deque(maxlen=1024)   # da chegada até o fim da transcrição
+esperas_ms = deque(maxlen=1024)     # tempo parado na fila
+clipes_em_lote = 0
+clipes_total = 0
 
-@app.post("/transcribe")
-async def transcribe(file: UploadFile = File(...)):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=file.filename) as tmp:
-        tmp.write(await file.read())
-        tmp_path = tmp.name
 
-    segments, info = model.transcribe(
-        tmp_path,
-        language="pt",
-        vad_filter=True,       # remove silêncio
-        beam_size=5
-    )
+def transcrever(arquivo, em_lote, ao_segmento=None):
+    """
+    Transcreve um clipe; usa o pipeline em lote quando há fila acumulada
 
-    text = " ".join([seg.text for seg in segments])
+    `ao_segmento`, se informado, é chamado com cada segmento assim que o
+    modelo o gera (rota /transcribe/stream).
+    """
+    # Decodifica direto do buffer do upload (memória, ou o spool do Starlette
+    # para arquivos grandes) para o array float32 de 16 kHz que o modelo consome
+    arquivo.seek(0)
+    audio = decode_audio(arquivo, sampling_rate=model.feature_extractor.sampling_rate)
 
-    os.remove(tmp_path)
+    if em_lote:
+        segments, info = batched_model.transcribe(
+            audio,
+            language="pt",
+            vad_filter=True,
+            batch_size=BATCH_SIZE
+        )
+    else:
+        segments, info = model.transcribe(
+            audio,
+            language="pt",
+            vad_filter=True,       # remove silêncio
+            beam_size=5
+        )
+
+    # Os segmentos são gerados sob demanda: consome tudo aqui, na thread do worker
+    partes = []
+    for seg in segments:
+        partes.append(seg.text)
+        if ao_segmento is not None:
+            ao_segmento(seg)
+    text = " ".join(partes)
 
     return {
         "language": info.language,
         "duration": info.duration,
         "text": text
     }
+
+
+def worker():
+    """Consome a fila de clipes indefinidamente"""
+    global em_processamento, clipes_em_lote, clipes_total
+
+    while True:
+        arquivo, futuro, loop, enfileirado_em, ao_segmento = fila.get()
+        inicio = time.perf_counter()
+        # Outros clipes esperando: prioriza vazão com o pipeline em lote. No
+        # streaming não: o pipeline em lote entrega os segmentos em rajadas
+        em_lote = ao_segmento is None and not fila.empty()
+
+        with estatisticas_lock:
+            em_processamento += 1
+            esperas_ms.append((inicio - enfileirado_em) * 1000)
+
+        try:
+            resultado = transcrever(arquivo, em_lote, ao_segmento)
+            loop.call_soon_threadsafe(_resolver, futuro, resultado, None)
+        except Exception as e:
+            loop.call_soon_threadsafe(_resolver, futuro, None, e)
+        finally:
+            if ao_segmento is not None:
+                # Fim dos segmentos; chega depois do _resolver acima
+                ao_segmento(None)
+            with estatisticas_lock:
+                em_processamento -= 1
+                clipes_total += 1
+                clipes_em_lote += int(em_lote)
+                latencias_ms.append((time.perf_counter() - enfileirado_em) * 1000)
+            fila.task_done()
+
+
+def _resolver(futuro, resultado, erro):
+    # O cliente pode ter desistido da requisição
+    if futuro.done():
+        return
+    if erro is not None:
+        futuro.set_exception(erro)
+    else:
+        futuro.set_result(resultado)
+
+
+def _percentis(valores):
+    if not valores:
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordenados = sorted(valores)
+    return {
+        "p50": ordenados[int(0.50 * (len(ordenados) - 1))],
+        "p95": ordenados[int(0.95 * (len(ordenados) - 1))],
+        "max": ordenados[-1]
+    }
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    for i in range(NUM_WORKERS):
+        threading.Thread(target=worker, name=f"whisper-worker-{i}", daemon=True).start()
+    yield
+
+
+app = FastAPI(title="Whisper GPU API", lifespan=lifespan)
+
+
+@app.post("/transcribe")
+async def transcribe(file: UploadFile = File(...)):
+    loop = asyncio.get_running_loop()
+    futuro = loop.create_future()
+    try:
+        # O UploadFile continua aberto até a resposta, então o worker lê dele direto
+        fila.put_nowait((file.file, futuro, loop, time.perf_counter(), None))
+    except queue.Full:
+        raise HTTPException(status_code=503, detail="Fila de transcrição cheia")
+
+    return await futuro
+
+
+@app.post("/transcribe/stream")
+async def transcribe_stream(file: UploadFile = File(...)):
+    """
+    Transcreve enviando cada segmento assim que é gerado (NDJSON)
+
+    Uma linha {"tipo": "segmento", "inicio", "fim", "texto"} por segmento e,
+    no final, {"tipo": "fim", "language", "duration", "text"} com o mesmo
+    conteúdo de /transcribe (ou {"tipo": "erro", "detail"}).
+    """
+    loop = asyncio.get_running_loop()
+    futuro = loop.create_future()
+    segmentos = asyncio.Queue()
+
+    def ao_segmento(seg):
+        # Chamado na thread do worker
+        evento = None if seg is None else {
+            "tipo": "segmento",
+            "inicio": seg.start,
+            "fim": seg.end,
+            "texto": seg.text.strip()
+        }
+        loop.call_soon_threadsafe(segmentos.put_nowait, evento)
+
+    if fila.full():
+        raise HTTPException(status_code=503, detail="Fila de transcrição cheia")
+
+    # Dependendo da versão do FastAPI, o UploadFile é fechado antes de o corpo
+    # da resposta ser enviado; o worker lê de uma cópia que é nossa
+    copia = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+    while bloco := await file.read(SPOOL_MAX):
+        copia.write(bloco)
+    # Fechada só depois que o worker termina de ler (o futuro é resolvido por ele)
+    futuro.add_done_callback(lambda _: copia.close())
+
+    try:
+        fila.put_nowait((copia, futuro, loop, time.perf_counter(), ao_segmento))
+    except queue.Full:
+        copia.close()
+        raise HTTPException(status_code=503, detail="Fila de transcrição cheia")
+
+    async def eventos():
+        while True:
+            evento = await segmentos.get()
+            if evento is None:
+                break
+            yield json.dumps(evento, ensure_ascii=False) + "\n"
+
+        try:
+            final = {"tipo": "fim", **futuro.result()}
+        except Exception as e:
+            final = {"tipo": "erro", "detail": str(e)}
+        yield json.dumps(final, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(eventos(), media_type="application/x-ndjson")
+
+
+@app.get("/metrics")
+async def metrics():
+    with estatisticas_lock:
+        return {
+            "fila": fila.qsize(),
+            "em_processamento": em_processamento,
+            "workers": NUM_WORKERS,
+            "clipes_total": clipes_total,
+            "clipes_em_lote": clipes_em_lote,
+            "latencia_ms": _percentis(latencias_ms),
+            "espera_fila_ms": _percentis(esperas_ms)
+        }